@@ -157,7 +157,19 @@ def t_NEWLINE(t):
 def t_error(v):
     print(( "Lex error: ", v ))
 
-lex.lex()
+# Directory to cache the generated lexer tables in (None to always build from the rules)
+lextab_dir = None
+
+def build_lexer():
+    """Build the lexer, in optimized mode using cached tables when lextab_dir is set"""
+    if lextab_dir is None: return lex.lex()
+    # The table module name changes with this file so stale tables are never loaded
+    import hashlib
+    digest = hashlib.sha1(open(__file__, 'rb').read()).hexdigest()[:16]
+    if lextab_dir not in sys.path: sys.path.insert(0, lextab_dir)
+    if not os.path.isdir(lextab_dir): os.makedirs(lextab_dir)
+    return lex.lex(optimize=1, lextab='CppHeaderParser_lextab_%s'%digest, outputdir=lextab_dir)
+
 # Controls error_print
 print_errors = 1
 # Controls warning_print
@@ -2034,11 +2046,12 @@ class CppHeader( _CppHeader ):
 
         # Change multi line #defines and expressions to single lines maintaining line nubmers
         # Based from http://stackoverflow.com/questions/2424458/regular-expression-to-match-cs-multiline-preprocessor-statements
-        matches = re.findall(r'(?m)^(?:.*\\\r?\n)+.*$', headerFileStr)
+        # Each match is rewritten in place during a single scan of the file
         is_define = re.compile(r'[ \t\v]*#[Dd][Ee][Ff][Ii][Nn][Ee]')
-        for m in matches:
+        def join_multiline(match):
+            m = match.group(0)
             #Keep the newlines so that linecount doesnt break
-            num_newlines = len([a for a in m if a=="\n"])
+            num_newlines = m.count("\n")
             if is_define.match(m):
                 new_m = m.replace("\n", "<CppHeaderParser_newline_temp_replacement>\\n")
             else:
@@ -2046,21 +2059,22 @@ class CppHeader( _CppHeader ):
                 new_m = m.replace("\\\n", " ")
             if (num_newlines > 0):
                 new_m += "\n"*(num_newlines)
-            headerFileStr = headerFileStr.replace(m, new_m)
+            return new_m
+        headerFileStr = re.sub(r'(?m)^(?:.*\\\r?\n)+.*$', join_multiline, headerFileStr)
         
         #Filter out Extern "C" statements.  These are order dependent
-        matches = re.findall(re.compile(r'extern[\t ]+"[Cc]"[\t \n\r]*{', re.DOTALL), headerFileStr)
-        for m in matches:
-            #Keep the newlines so that linecount doesnt break
-            num_newlines = len([a for a in m if a=="\n"])
-            headerFileStr = headerFileStr.replace(m, "\n" * num_newlines)        
+        #Keep the newlines so that linecount doesnt break
+        headerFileStr = re.sub(re.compile(r'extern[\t ]+"[Cc]"[\t \n\r]*{', re.DOTALL),
+            lambda match: "\n" * match.group(0).count("\n"), headerFileStr)
         headerFileStr = re.sub(r'extern[ ]+"[Cc]"[ ]*', "", headerFileStr)
                 
         #Filter out any ignore symbols that end with "()" to account for #define magic functions
         for ignore in ignoreSymbols:
             if not ignore.endswith("()"): continue
+            pieces = []
+            pos = 0
             while True:
-                locStart = headerFileStr.find(ignore[:-1])
+                locStart = headerFileStr.find(ignore[:-1], pos)
                 if locStart == -1:
                     break;
                 locEnd = None
@@ -2083,15 +2097,21 @@ class CppHeader( _CppHeader ):
                         if c == '"' and headerFileStr[i-1] != '\\':
                             inQuotes = False
                         
-                if locEnd:
-                    #Strip it out but keep the linecount the same so line numbers are right
-                    match_str = headerFileStr[locStart:locEnd]
-                    debug_print("Striping out '%s'"%match_str)
-                    num_newlines = len([a for a in match_str if a=="\n"])
-                    headerFileStr = headerFileStr.replace(headerFileStr[locStart:locEnd], "\n"*num_newlines)
+                if not locEnd:
+                    #Unbalanced, leave the rest of the file as is
+                    break;
+                #Strip it out but keep the linecount the same so line numbers are right
+                match_str = headerFileStr[locStart:locEnd]
+                debug_print("Striping out '%s'"%match_str)
+                pieces.append(headerFileStr[pos:locStart])
+                pieces.append("\n"*match_str.count("\n"))
+                pos = locEnd
+            pieces.append(headerFileStr[pos:])
+            headerFileStr = "".join(pieces)
         
         self.braceDepth = 0
-        lex.lex()
+        self.tokenCount = 0
+        build_lexer()
         lex.input(headerFileStr)
         global curLine
         global curChar
@@ -2101,6 +2121,7 @@ class CppHeader( _CppHeader ):
             while True:
                 tok = lex.token()
                 if not tok: break
+                self.tokenCount += 1
                 if self.anon_union_counter[0] == self.braceDepth and self.anon_union_counter[1]:
                     self.anon_union_counter[1] -= 1
                 tok.value = TagStr(tok.value, lineno=tok.lineno)
@@ -23,6 +23,45 @@ def warning(msg, *args): sys.stderr.write(WARNING+msg%args+"\n"+ENDC);  LOG[0]+=
 def error(msg, *args): sys.stderr.write(FAIL+msg%args+"\n"+ENDC);       LOG[0]+="E: "+msg%args+"\n"
 def blacklist(msg, *args): sys.stderr.write(OKBLUE+msg%args+"\n"+ENDC); LOG[0]+="B: "+msg%args+"\n"
 
+########################################################################
+## Phase timing for --profile
+########################################################################
+import contextlib
+import time
+
+#timing records and header statistics of this process,
+#None unless profiling is enabled
+PROFILE = [None]
+
+def initProfile(enabled):
+    #the serial pool initializes its worker in this process, keep the records
+    if not enabled: PROFILE[0] = None
+    elif PROFILE[0] is None: PROFILE[0] = AttributeDict(records=list(), labels=dict(), header=dict())
+
+@contextlib.contextmanager
+def profiled(phase, **labels):
+    #records the wall and CPU time of the enclosed code,
+    #the labels (resource, block, subtype) carry into nested phases
+    if PROFILE[0] is None:
+        yield
+        return
+    outer = PROFILE[0].labels
+    PROFILE[0].labels = dict(outer, **labels)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try: yield
+    finally:
+        record = dict(PROFILE[0].labels, phase=phase, wall=time.perf_counter()-wall, cpu=time.process_time()-cpu)
+        PROFILE[0].labels = outer
+        PROFILE[0].records.append(record)
+
+def profileHeader(**stats):
+    if PROFILE[0] is not None: PROFILE[0].header.update(stats)
+
+def takeProfileRecords():
+    if PROFILE[0] is None: return None
+    records, PROFILE[0].records = PROFILE[0].records, list()
+    return records
+
 ########################################################################
 ## Parse the liquid dsp header
 ########################################################################
@@ -31,10 +70,12 @@ import sys
 import re
 
 sys.path.append(os.path.dirname(__file__))
-import CppHeaderParser
 
-def parseHeader(contents):
+#generated files that can be reused across runs are stored here when set:
+#compiled templates and the header parser's lexer tables
+CACHE_DIR = [None]
 
+def normalizeHeader(contents):
     #add newlines lost from macro expansion back into the /**/ comments
     #to ensure that the docs get associated with the proceeding function
     contents = contents.replace('/*', '\n/*')
@@ -48,17 +89,573 @@ def parseHeader(contents):
     contents = contents.replace('typedef struct', 'typedef')
 
     #the lexer can only handle C++ style enums
+    #(single pass: copy the text between enums and rewrite each enum)
+    pieces = list()
     s = 0
     while True:
-        s = contents.find('typedef enum', s)
-        if s < 0: break
-        e = contents.find(';\n', s)
-        enum = contents[s:e]
+        e = contents.find('typedef enum', s)
+        if e < 0: break
+        pieces.append(contents[s:e])
+        s = contents.find(';\n', e)
+        if s < 0: s = len(contents)
+        enum = contents[e:s]
         name = re.findall('\w+', enum, re.MULTILINE)[-1]
-        contents = contents.replace(enum, enum.replace('typedef enum', 'enum %s'%name))
-        s = e
+        pieces.append(enum.replace('typedef enum', 'enum %s'%name))
+    pieces.append(contents[s:])
+    return ''.join(pieces)
+
+def parseHeader(contents):
+    import CppHeaderParser
+    CppHeaderParser.lextab_dir = CACHE_DIR[0]
+
+    #time the finalize pass apart from the lexing and evaluation
+    class CppHeader(CppHeaderParser.CppHeader):
+        def finalize(self):
+            with profiled('finalize'): CppHeaderParser.CppHeader.finalize(self)
+
+    with profiled('normalize'): contents = normalizeHeader(contents)
+    return CppHeader(contents, argType='string')
+
+########################################################################
+## Index the header to parse only the declarations a block needs
+########################################################################
+HEADER_TOKENS = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:[^"\\]|\\.)*"|[{};]', re.DOTALL)
+HEADER_COMMENTS = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+HEADER_IDENTIFIERS = re.compile(r'[A-Za-z_]\w*')
+
+def makeDeclSpan(contents, start, end):
+    code = HEADER_COMMENTS.sub(' ', contents[start:end]).strip()
+    idents = HEADER_IDENTIFIERS.findall(code)
+    kind, name = 'other', None
+    if not code.strip(';').strip(): kind = 'empty'
+    elif re.match(r'typedef\s+enum\b', code):
+        kind, name = 'enum', idents[-1]
+    elif code.startswith('typedef'):
+        funcPtr = re.search(r'\(\s*\*\s*(\w+)\s*\)', code)
+        kind, name = 'typedef', funcPtr.group(1) if funcPtr else idents[-1]
+    elif re.match(r'(enum|struct|union)\b', code):
+        kind = 'enum' if code.startswith('enum') else 'struct'
+        match = re.match(r'\w+\s+(\w+)\s*{', code)
+        if match: name = match.group(1)
+    elif '(' in code.split('[', 1)[0]:
+        kind, name = 'function', HEADER_IDENTIFIERS.findall(code.split('(', 1)[0])[-1]
+    elif idents: kind, name = 'variable', idents[-1]
+    return AttributeDict(start=start, end=end, kind=kind, name=name, idents=idents)
+
+def indexHeader(contents):
+    #split the header into top level declarations,
+    #each span owns the comments that precede it
+    spans = list()
+    depth = list()
+    start = 0
+    for match in HEADER_TOKENS.finditer(contents):
+        tok = match.group(0)
+        if tok == '{':
+            code = HEADER_COMMENTS.sub(' ', contents[start:match.start()]).split()
+            #extern "C" blocks are transparent, the declarations inside are top level
+            if not depth and code == ['extern', '"C"']:
+                depth.append(False)
+                start = match.end()
+            else: depth.append(True)
+        elif tok == '}' and depth:
+            braces = depth.pop()
+            if not braces: start = match.end()
+            #a function body ends the declaration without a semicolon
+            elif not [d for d in depth if d] and '(' in HEADER_COMMENTS.sub(' ', contents[start:match.start()]).split('{', 1)[0]:
+                spans.append(makeDeclSpan(contents, start, match.end()))
+                start = match.end()
+        elif tok == ';' and not [d for d in depth if d]:
+            spans.append(makeDeclSpan(contents, start, match.end()))
+            start = match.end()
+    return spans
+
+def selectHeader(contents, prefixes, names, allEnums=False):
+    spans = indexHeader(contents)
+    defines = dict()
+    for i, span in enumerate(spans):
+        if span.kind in ('typedef', 'enum', 'struct') and span.name:
+            defines.setdefault(span.name, list()).append(i)
+
+    #the declarations requested by name or by symbol prefix
+    selected = set()
+    for i, span in enumerate(spans):
+        if span.kind in ('function', 'variable') and span.name.startswith(tuple(prefixes)): selected.add(i)
+        elif span.kind == 'enum' and (allEnums or span.name in names): selected.add(i)
+        elif span.name in names: selected.add(i)
+
+    #declarations keep their comments for the documentation,
+    #and since the parser carries comments across typedefs into the next
+    #declaration, so do the type definitions directly preceding it;
+    #other type definitions that the declarations refer to are added bare
+    required = set()
+    documented = set()
+    pending = list(selected)
+    while pending:
+        i = pending.pop()
+        if i in required: continue
+        required.add(i)
+        if spans[i].kind in ('function', 'variable', 'enum'):
+            j = i
+            while j >= 0 and (j == i or spans[j].kind in ('typedef', 'struct', 'empty')):
+                documented.add(j)
+                pending.append(j)
+                j -= 1
+        for name in spans[i].idents:
+            pending.extend(defines.get(name, []))
+
+    pieces = list()
+    for i in sorted(required):
+        span = spans[i]
+        if i in documented: pieces.append(contents[span.start:span.end])
+        else: pieces.append(HEADER_COMMENTS.sub(' ', contents[span.start:span.end]))
+    return '\n'.join(pieces)+'\n'
+
+def extractHeaderSymbols(blocksData):
+    #the symbol prefixes and type names used by the blocks in a yaml
+    prefixes = set()
+    names = set()
+    for blockName, blockData in blocksData.items():
+        prefixes.add(blockData.get('key', blockName)+'_')
+        #the fast convolution object of a filter is another liquid object
+        if 'key' in blockData.get('fastconv', {}): prefixes.add(blockData['fastconv']['key']+'_')
+        for typemap in blockData.get('typemaps', {}).values():
+            names.update(HEADER_IDENTIFIERS.findall(typemap))
+    return prefixes, names
+
+########################################################################
+## Scan the flat C declarations without the general purpose parser
+########################################################################
+#The header is a flat list of C declarations. The scanner tokenizes it like
+#the parser's lexer and applies the parser's rules for the few constructs
+#that occur (functions, typedefs, enums, structs), so the functions and enums
+#come out the same, including the comments the parser collects as doxygen.
+SCAN_BLOCK_COMMENT = r'\*[^*]*\*+(?:[^/*][^*]*\*+)*/'
+SCAN_DOXYGEN_BLOCK = r'\*[*!][^*]*\*+(?:[^/*][^*]*\*+)*/'
+SCAN_DELIMITERS = re.compile(
+    r'/(?:(/[!/][^\n]*\n(?://[!/][^\n]*\n)*)|' #adjacent doxygen line comments
+    r'(%s(?:\s*/%s)*)|'%(SCAN_DOXYGEN_BLOCK, SCAN_DOXYGEN_BLOCK) + #doxygen block comments
+    r'/[^\n]*\n|%s)|("(?:[^"\\]|\\.)*")|([{};])'%SCAN_BLOCK_COMMENT)
+SCAN_BLOCK_GAPS = re.compile(r'\*/\s+/\*')
+SCAN_TOKENS = re.compile(
+    r'[<>A-Za-z_~][A-Za-z0-9_]*|[-+]?[0-9]*\.[0-9]+(?:[eE][-+]?[0-9]+)?|[0-9][0-9XxA-Fa-f]*|'
+    r'"(?:[^"\\]|\\.)*"|\'[^\n]\'|[^\s.?@]')
+
+#tokens that the parser lexes but never puts on its name stack
+SCAN_SKIPPED = set(['/', "'", '__extension__', 'Q_OBJECT'])
+
+SCAN_FUNDAMENTAL = set('size_t unsigned signed bool char wchar short int float double long void struct union enum'.split())
+SCAN_NONSTANDARD = set('int8 int16 int32 int64 uint uint8 uint16 uint32 uint64'.split())
+
+SCAN_IS_FUNDAMENTAL = set('size_t struct union unsigned signed bool char short int float double long void *'.split())
+SCAN_TYPE_PUNCTUATION = re.compile(r'[:<>,]')
+SCAN_DOXYGEN_INDENT = re.compile(r'\n[\s]+\*')
+
+def scanIsFundamental(s):
+    for a in s.split():
+        if a not in SCAN_IS_FUNDAMENTAL: return False
+    return True
+
+def scanIsFunctionPointer(stack):
+    #needs two top level parenthesis groups
+    if stack.count('(') < 2: return False
+    depth, count, star, last = 0, 0, False, None
+    for e in stack:
+        if e == '(': depth += 1
+        elif e == ')' and depth > 0:
+            depth -= 1
+            if depth == 0: count += 1
+        elif e == '*' and last == '(' and count == 0 and depth == 1: star = True
+        last = e
+    return star and count == 2
+
+def scanIsMethod(stack):
+    if '(' not in stack or ')' not in stack or stack[0] == 'typedef': return False
+    if '{' in stack and stack.index('{') < stack.index('('): return False
+    if '{' in stack and '}' in stack: r = True
+    elif stack[-1] == ';': r = not scanIsFunctionPointer(stack)
+    else: r = '{' in stack
+    if r and '=' in stack and stack.index('=') < stack.index('('): r = False
+    return r
+
+def scanStripAttribute(stack, first=True):
+    #remove __attribute__(...) groups (the parser strips the first
+    #one from a statement and all of them from a parameter list)
+    while '__attribute__' in stack:
+        i = stack.index('__attribute__')
+        j = i+1
+        if j < len(stack) and stack[j] == '(':
+            depth = 0
+            for j in range(i+1, len(stack)):
+                if stack[j] == '(': depth += 1
+                elif stack[j] == ')': depth -= 1
+                if depth == 0: break
+            j += 1
+        stack = stack[:i] + stack[j:]
+        if first: break
+    return stack
+
+def scanTypedef(stack, typedefs):
+    stack = list(stack)
+    while stack and stack[-1].isdigit(): stack.pop()
+    s = ''
+    for a in stack[stack.index('typedef')+1:-1]:
+        if a == '{': break
+        if not s or s[-1] in ':<>' or a in ':<>': s += a
+        else: s += ' ' + a
+    if s: typedefs[stack[-1]] = s
+
+def scanPointers(typeName, typedefs, cache):
+    #pointers in the type plus the pointers hidden behind typedefs
+    if typeName in cache: return cache[typeName]
+    pointer = typeName.split('>')[-1].count('*')
+    x = typeName
+    for a in ('*', '&', 'const', 'static', 'mutable'): x = x.replace(a, '')
+    for y in x.split():
+        if y in SCAN_FUNDAMENTAL: continue
+        if y not in SCAN_NONSTANDARD and y in typedefs: pointer += scanPointers(typedefs[y], typedefs, cache)
+        break
+    cache[typeName] = pointer
+    return pointer
+
+def scanParameter(stack):
+    if '[' in stack: stack = stack[:stack.index('[')]
+    stack = list(stack)
+    if '=' not in stack:
+        while stack and stack[-1].isdigit(): stack.pop()
+        if stack and stack[-1].endswith(':'): stack[-1] = stack[-1][:-1]
+    while stack and not stack[-1]: stack.pop()
+    if not stack: return None
+    if len(stack) == 1: typeName, name = stack[0], ''
+    elif scanIsFunctionPointer(stack):
+        i, j = stack.index('('), stack.index(')')
+        typeName, name = ' '.join(stack[:i+2] + stack[j:]), ' '.join(stack[i+2:j])
+    elif '=' in stack:
+        i = stack.index('=')
+        typeName, name = ' '.join(stack[:i-1]), stack[i-1]
+    elif scanIsFundamental(stack[-1]) or stack[-1] in ('>', '<', ':', '.'):
+        typeName, name = ' '.join(stack), ''
+    else: typeName, name = ' '.join(stack[:-1]), stack[-1]
+    if SCAN_TYPE_PUNCTUATION.search(typeName):
+        typeName = typeName.replace(' :', ':').replace(': ', ':').replace(' <', '<').replace(' >', '>')
+        typeName = typeName.replace('>>', '> >').replace('>>', '> >').replace(' ,', ',')
+    typeName = ' '.join(['const' if b == '__const__' else b for b in typeName.split()])
+    return name, typeName
+
+def scanParameters(stack, cache):
+    stack = scanStripAttribute(list(stack), first=False)
+    if len(stack) > 5 and stack[:5] == ['(', '(', '__const__', ')', ')']: stack = stack[5:]
+    stack = stack[stack.index('(')+1:]
+    if not stack or (len(stack) >= 3 and stack[0] == ')' and stack[1] == ':'): return []
+    stack = stack[:len(stack)-1-stack[::-1].index(')')]
+
+    #function pointer parameters are glued into a single token
+    if '(' in stack:
+        r = list()
+        hit = False
+        for a in stack:
+            if a == '(': hit = True
+            elif a == ')': hit = False
+            if hit or a == ')': r[-1] = r[-1] + a
+            else: r.append(a)
+        stack = r
+
+    #a leading comma does not separate (the parser checks the index for truth)
+    params = list()
+    while stack:
+        separator = stack.index(',') if ',' in stack else 0
+        param = tuple(stack[:separator] if separator else stack)
+        if param not in cache: cache[param] = scanParameter(param)
+        if cache[param] is not None: params.append(cache[param])
+        if not separator: break
+        stack = stack[separator+1:]
+    return params
+
+def scanReturnType(head):
+    rtnType = ' '.join(head)
+    if rtnType.startswith('virtual'): rtnType = rtnType[len('virtual'):].strip()
+    if not rtnType: rtnType = 'void'
+    rtnType = rtnType.replace(' <', '<').replace(' >', '>').replace(' ,', ',')
+
+    #the return type without qualifiers and pointers
+    header = ' '.join(head).split()
+    for tag in ('extern', 'virtual', 'static', 'explicit', 'inline', 'friend'):
+        if tag in header: header.remove(tag)
+    returns = ' '.join(header).replace(' <', '<').strip()
+    returnsPointer = returns.split('>')[-1].count('*')
+    if returnsPointer: returns = returns.replace('*', '').strip()
+    returns = returns.replace('&', '').strip()
+    returns = ' '.join([b for b in returns.split() if b not in ('const', '__const__')])
+    return rtnType, returns, returnsPointer
+
+def scanFunction(stack, doxygen, returnsCache, paramsCache, paramCache):
+    #return types and parameter lists repeat across the header,
+    #both are parsed once and shared between the functions
+    i = stack.index('(')
+    head = tuple(stack[:i-1])
+    if head not in returnsCache: returnsCache[head] = scanReturnType(head)
+    rtnType, returns, returnsPointer = returnsCache[head]
+    params = tuple(stack) if '__attribute__' in head else tuple(stack[i:])
+    if params not in paramsCache: paramsCache[params] = scanParameters(params, paramCache)
+
+    data = {'name': stack[i-1], 'parameters': paramsCache[params],
+        'returns': returns, 'returns_pointer': returnsPointer, 'rtnType': rtnType}
+    if doxygen: data['doxygen'] = doxygen
+    return data
+
+def scanEnumValues(values):
+    i = 0
+    names = [v['name'] for v in values]
+    for v in values:
+        if 'value' in v:
+            a = v['value'].strip()
+            if len(a) == 3 and a[0] == "'" and a[2] == "'": a = a[1]
+            if a.lower().startswith('0x'):
+                try: i = a = int(a, 16)
+                except ValueError: pass
+            elif a.isdigit(): i = a = int(a)
+            elif a in names or '"' in a or "'" in a: pass
+            else:
+                try: a = i = ord(a)
+                except TypeError: pass
+            v['value'] = a
+        else: v['value'] = i
+        if isinstance(v['value'], str): v['value'] = v['value'].replace(' < < ', ' << ')
+        i += 1
+
+def scanEnum(stack, doxygen):
+    if len(stack) < 4 or '{' not in stack or '}' not in stack: return None
+    values = list()
+    valueStack = stack[stack.index('{')+1:stack.index('}')]
+    while valueStack:
+        if ',' in valueStack:
+            tmpStack = valueStack[:valueStack.index(',')]
+            valueStack = valueStack[valueStack.index(',')+1:]
+        else: tmpStack, valueStack = valueStack, []
+        if len(tmpStack) == 1: values.append(dict(name=tmpStack[0]))
+        elif len(tmpStack) >= 3 and tmpStack[1] == '=': values.append(dict(name=tmpStack[0], value=' '.join(tmpStack[2:])))
+        elif len(tmpStack) == 2 and tmpStack[1] == '=': values.append(dict(name=tmpStack[0]))
+    if not values: return None
+    scanEnumValues(values)
+
+    data = dict(values=values)
+    preBrace = stack[:stack.index('{')]
+    postBrace = stack[stack.index('}')+1:]
+    if len(preBrace) == 2 and 'typedef' not in stack: data['name'] = preBrace[1]
+    elif postBrace and 'typedef' in stack: data['name'] = ' '.join(postBrace)
+    if doxygen: data['doxygen'] = doxygen
+    return data
+
+def scanExternC(contents):
+    #the parser strips extern "C" with two substitutions over the header,
+    #the matches never leave the line of the "C" and the blanks after it,
+    #so only those spans get rewritten instead of the whole header
+    spans = list()
+    for quoted in ('"C"', '"c"'):
+        i = contents.find(quoted)
+        while i >= 0:
+            j = i+3
+            while j < len(contents) and contents[j] in '\t \n\r': j += 1
+            if contents.startswith('{', j): j += 1
+            spans.append([contents.rfind('\n', 0, i)+1, j])
+            i = contents.find(quoted, i+3)
+    merged = list()
+    for span in sorted(spans):
+        if merged and span[0] <= merged[-1][1]: merged[-1][1] = max(merged[-1][1], span[1])
+        else: merged.append(span)
+
+    pieces = list()
+    end = 0
+    for i, j in merged:
+        text = re.sub(r'extern[\t ]+"[Cc]"[\t \n\r]*{', lambda m: '\n'*m.group(0).count('\n'), contents[i:j])
+        pieces.extend([contents[end:i], re.sub(r'extern[ ]+"[Cc]"[ ]*', '', text)])
+        end = j
+    pieces.append(contents[end:])
+    return ''.join(pieces)
+
+def scanHeader(contents):
+    contents = scanExternC(normalizeHeader(contents))
+
+    functions = list()
+    enums = list()
+    typedefs = dict()
+    doxygen = ''
+    stack = list()
+    depth = 0
+    tokens = [0]
+    returnsCache = dict()
+    paramsCache = dict()
+    paramCache = dict()
+    pointerCache = dict()
+
+    def isEnum(stack): return stack[:1] == ['enum'] or stack[:2] == ['typedef', 'enum']
+    def isTypedef(stack): return 'typedef' in stack and 'struct' not in stack
+
+    #returns true when the parser would have consumed the pending comments
+    def evaluate(stack, end):
+        if '__attribute__' in stack: stack = scanStripAttribute(stack)
+        #array sizes in parenthesis: name[(n)] -> name[]
+        if '[' in stack and '(' in stack and stack.index('[') == stack.index('(')-1:
+            stack = stack[:stack.index('[')+1] + stack[stack.index(')')+1:]
+        if 'typedef' in stack and 'struct' not in stack:
+            if end == ';' and '{' not in stack: scanTypedef(stack, typedefs)
+            return False
+        if not stack: return False
+        if stack[0] == 'enum' or stack[:2] == ['typedef', 'enum']:
+            enum = scanEnum(stack, doxygen)
+            if enum: enums.append(enum)
+        elif depth == 0 and '(' in stack and scanIsMethod(stack+[end]):
+            functions.append(scanFunction(stack, doxygen, returnsCache, paramsCache, paramCache))
+        return True
+
+    #the code between the comments is gathered and tokenized
+    #onto the stack once per statement delimiter
+    def push(code):
+        code = ' '.join(code)
+        toks = SCAN_TOKENS.findall(code)
+        tokens[0] += len(toks)
+        if '/' not in code and "'" not in code and ':' not in code and '__extension__' not in code and 'Q_OBJECT' not in code: stack.extend(toks)
+        else:
+            for tok in toks:
+                if tok in SCAN_SKIPPED or (tok == ':' and not stack): continue
+                stack.append(tok)
+
+    #the split interleaves the code with the groups of each delimiter
+    parts = SCAN_DELIMITERS.split(contents)
+    code = [parts[0]]
+    for lines, blocks, string, tok, text in zip(parts[1::5], parts[2::5], parts[3::5], parts[4::5], parts[5::5]):
+        if tok is None:
+            #comments accumulate into the doxygen of the next declaration,
+            #runs of comments are merged the same way the parser would one by one
+            if lines is not None:
+                if doxygen: doxygen += '\n'
+                doxygen += '/' + lines[:-1]
+            elif blocks is not None:
+                if blocks.count('*/') > 1: blocks = SCAN_BLOCK_GAPS.sub('*//*', blocks)
+                if '\n' in blocks: blocks = SCAN_DOXYGEN_INDENT.sub('\n*', blocks.replace('\n\n', '\n'))
+                doxygen += '/' + blocks
+            elif string is not None: code.append(string)
+            code.append(text)
+            continue
+
+        push(code)
+        code = [text]
+        if tok == '{':
+            if not stack or isEnum(stack) or isTypedef(stack): stack.append(tok)
+            else:
+                if evaluate(stack, tok): doxygen = ''
+                stack = list()
+            depth += 1
+        elif tok == '}':
+            if depth == 0: continue
+            if stack and isEnum(stack): stack.append(tok)
+            else:
+                if evaluate(stack, tok): doxygen = ''
+                if not isTypedef(stack): stack = list()
+            depth -= 1
+        else:
+            if evaluate(stack, tok): doxygen = ''
+            stack = list()
 
-    return CppHeaderParser.CppHeader(contents, argType='string')
+    #typedefs resolve against the whole header like the parser does
+    for func in functions:
+        func['parameters'] = [dict(name=name, type=typeName, pointer=scanPointers(typeName, typedefs, pointerCache))
+            for name, typeName in func['parameters']]
+    return AttributeDict(functions=functions, enums=enums, tokens=tokens[0])
+
+########################################################################
+## Cache the parsed header on disk
+########################################################################
+import hashlib
+import json
+
+#bump when the layout of the cached data changes
+HEADER_CACHE_VERSION = 1
+
+#changes to the parser or the normalization rules invalidate the cache
+HEADER_CACHE_SOURCES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CppHeaderParser.py'),
+    os.path.abspath(__file__),
+]
+
+def headerCachePath(liquidH, selection=None):
+    if selection: return '%s.%s.cache.json'%(liquidH, selection)
+    return liquidH + '.cache.json'
+
+def headerCacheKey(contents, parser):
+    h = hashlib.sha1()
+    h.update(str(HEADER_CACHE_VERSION).encode('utf-8'))
+    h.update(parser.encode('utf-8'))
+    for source in HEADER_CACHE_SOURCES:
+        h.update(open(source, 'rb').read())
+    h.update(contents.encode('utf-8'))
+    return h.hexdigest()
+
+def reduceHeader(parsed):
+    #keep only the plain data fields used by the generator,
+    #the parser objects have back-references and are not serializable
+    functions = list()
+    for func in parsed.functions:
+        data = dict(
+            name=str(func['name']),
+            parameters=[dict(name=str(p['name']), type=p['type'], pointer=p['pointer']) for p in func['parameters']],
+            returns=func['returns'],
+            returns_pointer=func['returns_pointer'],
+            rtnType=func['rtnType'])
+        if 'doxygen' in func: data['doxygen'] = func['doxygen']
+        functions.append(data)
+
+    enums = list()
+    for enum in parsed.enums:
+        data = dict(values=[dict(name=str(v['name']), value=v['value']) for v in enum['values']])
+        if 'name' in enum: data['name'] = enum['name']
+        if 'doxygen' in enum: data['doxygen'] = enum['doxygen']
+        enums.append(data)
+
+    return AttributeDict(functions=functions, enums=enums)
+
+def writeHeaderCache(cachePath, key, headerData):
+    #write to a temporary file and rename so that concurrent
+    #generator processes never observe a partially written cache
+    tmpPath = '%s.%d.tmp'%(cachePath, os.getpid())
+    with open(tmpPath, 'w') as f:
+        json.dump(dict(key=key, functions=headerData.functions, enums=headerData.enums), f)
+    os.replace(tmpPath, cachePath)
+
+def loadHeaderCache(cachePath, key):
+    try: data = json.loads(open(cachePath).read())
+    except (IOError, OSError, ValueError): return None
+    if data.get('key') != key: return None
+    return AttributeDict(functions=data['functions'], enums=data['enums'])
+
+def compareHeaders(scanned, parsed):
+    #report the declarations where the scanner and the parser disagree
+    for kind in ('functions', 'enums'):
+        if len(scanned[kind]) != len(parsed[kind]):
+            warning('Header scan found %d %s, the parser found %d', len(scanned[kind]), kind, len(parsed[kind]))
+        for a, b in zip(scanned[kind], parsed[kind]):
+            if a != b: warning('Header scan differs from the parser for %s %s', kind, b.get('name', a.get('name')))
+
+def readHeader(contents, parser):
+    if parser == 'scan':
+        with profiled('scan'): headerData = scanHeader(contents)
+        profileHeader(tokens=headerData.tokens)
+        return headerData
+    with profiled('parse'): parsed = parseHeader(contents)
+    with profiled('reduce'): headerData = reduceHeader(parsed)
+    profileHeader(tokens=parsed.tokenCount)
+    if parser == 'check':
+        with profiled('scan'): compareHeaders(scanHeader(contents), headerData)
+    return headerData
+
+def loadHeader(contents, cachePath, parser='cpp'):
+    key = headerCacheKey(contents, parser)
+    with profiled('cache read'): headerData = loadHeaderCache(cachePath, key)
+    profileHeader(parser=parser, bytes=len(contents), cached=headerData is not None)
+    if headerData is None:
+        headerData = readHeader(contents, parser)
+        with profiled('cache write'): writeHeaderCache(cachePath, key, headerData)
+    profileHeader(functions=len(headerData.functions), enums=len(headerData.enums))
+    return headerData
 
 ########################################################################
 ## Utilities for attribute extraction
@@ -76,13 +673,26 @@ def extractDocumentation(data):
             tok = tok.strip()
             if tok: yield(tok)
 
-def extractBlockFunctions(blockName, headerData):
-    blockFunctions = dict()
+def getHeaderIndex(headerData):
+    #built once per header: functions keyed by every underscore
+    #separated name prefix, then by the remaining name suffix
+    if 'index' in headerData: return headerData.index
+    functions = dict()
     for func in headerData.functions:
-        if not func['name'].startswith(blockName+'_'): continue
         func = AttributeDict([(k, v) for k, v in func.items()])
-        blockFunctions[func.name.replace(blockName+'_', '')] = func
-    return blockFunctions
+        i = func.name.find('_')
+        while i >= 0:
+            functions.setdefault(func.name[:i], dict())[func.name[i+1:]] = func
+            i = func.name.find('_', i+1)
+    headerData.index = AttributeDict(
+        functions=functions,
+        enums=dict([(enum['name'], enum) for enum in headerData.enums if 'name' in enum]),
+        subtypes=dict(),
+        objects=dict())
+    return headerData.index
+
+def extractBlockFunctions(blockName, headerData):
+    return getHeaderIndex(headerData).functions.get(blockName, dict())
 
 def extractFunctionData(dataKey, blockData, myFilter, blockFunctions):
     keys = list()
@@ -96,8 +706,8 @@ def extractFunctionData(dataKey, blockData, myFilter, blockFunctions):
             if not myFilter(key): continue
             keys.append(key)
 
+    typemaps = blockData.get('typemaps', {})
     def getParamType(p):
-        typemaps = blockData.get('typemaps', {})
         if p['name'] not in typemaps: return p['type']
         oldType = p['type']
         newType = typemaps[p['name']]
@@ -118,9 +728,12 @@ def extractFunctionData(dataKey, blockData, myFilter, blockFunctions):
     for key in keys:
         data = blockFunctions[key]
         getDefault = lambda p: defaultsData.get(p['name'], internalsData.get(p['name'], p['name'] if dataKey == 'constructor' else None))
-        params = [AttributeDict(name=param['name'], type=getParamType(param), default=getDefault(param)) for param in data['parameters']]
+        #base and stars keep the header type for the subtype traits
+        params = [AttributeDict(name=param['name'], type=getParamType(param), default=getDefault(param),
+            base=param['type'].replace('*', '').strip(), stars=param['type'].count('*')*'*',
+            typemap=typemaps.get(param['name'])) for param in data['parameters']]
         for extParamName, extParamType in externalsData.items():
-            params.append(AttributeDict(name=extParamName, type=extParamType, default=extParamName))
+            params.append(AttributeDict(name=extParamName, type=extParamType, default=extParamName, base=None))
         if dataKey != 'constructor': params = params[1:] #strip object for function calls
         if dataKey == 'constructor' and len(params) == 1 and params[0].type == 'void': params = [] #skip foo(void)
 
@@ -176,6 +789,7 @@ def extractPorts(dataKey, prefix, blockData, blockFunctions):
             except: pass
         assert(argIdx is not None)
         if argIdx == -1: param = dict(
+            name=fcnKey,
             pointer=blockFunctions[fcnKey]['returns_pointer'],
             type=blockFunctions[fcnKey]['returns'])
         else:
@@ -197,12 +811,53 @@ def extractPorts(dataKey, prefix, blockData, blockFunctions):
             alias=alias,
             reserve=reserve,
             fcnKey=fcnKey,
+            slot=param['name'],
             argIdx=argIdx))
     return ports
 
-def extractWorker(blockData, blockFunctions, inputs, outputs):
+def extractBatchCall(workCall, blockFunctions, inputs, outputs):
+    #the _block variant of a per-sample work call takes the buffers and a count _n,
+    #its arguments are matched to the per-sample call by parameter name,
+    #or by position when liquid named them differently
+    workRet, workFcn, workArgs = workCall
+    batchFcn = workFcn+'_block'
+    if workRet is not None or batchFcn not in blockFunctions: return None
+    params = blockFunctions[workFcn]['parameters'][1:]
+    batchParams = blockFunctions[batchFcn]['parameters'][1:]
+    counts = [p for p in batchParams if p['name'] == '_n' and not p['pointer']]
+    if len(counts) != 1: return None
+    batchParams = [p for p in batchParams if p is not counts[0]]
+    if len(batchParams) != len(params): return None
+    names = [p['name'] for p in params]
+    if sorted(names) == sorted([p['name'] for p in batchParams]):
+        params = [params[names.index(p['name'])] for p in batchParams]
+        workArgs = [workArgs[names.index(p['name'])] for p in batchParams]
+
+    #ports pass their buffer, other arguments must keep their type
+    args = list()
+    for param, batchParam, arg in zip(params, batchParams, workArgs):
+        matches = [port for port in inputs + outputs if port.key == arg]
+        if matches:
+            if not batchParam['pointer'] or batchParam['type'].replace('*', '').strip() != matches[0].type: return None
+            args.append(matches[0].buffVar)
+        elif batchParam['type'] == param['type']: args.append(arg)
+        else: return None
+    args.insert(blockFunctions[batchFcn]['parameters'].index(counts[0])-1, 'N')
+    return (batchFcn, args)
+
+def extractWorker(blockData, blockFunctions, inputs, outputs, batch=True):
     workData = blockData['work']
     workCalls = extractWorkCalls(blockData)
+    mode = workData.get('mode', 'STANDARD_LOOP')
+
+    #a per-sample loop becomes one call per work() when all calls have a _block variant
+    batchCalls = list()
+    if batch and workData.get('batch', True) and mode == 'STANDARD_LOOP':
+        batchCalls = [extractBatchCall(workCall, blockFunctions, inputs, outputs) for workCall in workCalls]
+    if batchCalls and None not in batchCalls:
+        mode = 'STANDARD_BLOCK'
+        workCalls = [(None, batchFcn, args) for batchFcn, args in batchCalls]
+
     functions = list()
     for workRet, workFcn, workArgs in workCalls:
         fcnData = blockFunctions[workFcn]
@@ -212,40 +867,393 @@ def extractWorker(blockData, blockFunctions, inputs, outputs):
             if matches: funcArgs.append(matches[0].buffPass)
             else: funcArgs.append(arg)
         name = fcnData['name']
+        target = None
         if workRet is not None:
             matches = [port for port in inputs + outputs if port.key == workRet]
-            if matches: name = '%s = %s'%(matches[0].buffPass, name)
-            else: name = '%s = %s'%(workRet, name)
-        functions.append(AttributeDict(name=name, args=', '.join(funcArgs)))
+            target = matches[0].buffPass if matches else workRet
+            name = '%s = %s'%(target, name)
+        functions.append(AttributeDict(name=name, key=workFcn, call=fcnData['name'], target=target, args=', '.join(funcArgs)))
     return AttributeDict(
         functions=functions,
-        mode=workData.get('mode', 'STANDARD_LOOP'),
+        mode=mode,
+        inplace=workData.get('inplace', False),
         factor=workData.get('factor', 1),
         decim=workData.get('decim', 1),
         interp=workData.get('interp', 1))
 
 def extractSubtypes(blockKey, headerData):
+    index = getHeaderIndex(headerData)
+    if blockKey not in index.subtypes: index.subtypes[blockKey] = extractSubtypes1(blockKey, headerData)
+    return index.subtypes[blockKey]
+
+def extractSubtypes1(blockKey, headerData):
     blockNames = extractBlockFunctions(blockKey, headerData).keys()
+    subkeys = list() #subtypes in header order for stable output
     subtypes = dict()
     for fullName in blockNames:
         if '_' not in fullName: return list()
         subkey, name = fullName.split('_', 1)
-        if subkey not in subtypes: subtypes[subkey] = set()
+        if subkey not in subtypes:
+            subkeys.append(subkey)
+            subtypes[subkey] = set()
         subtypes[subkey].add(name)
 
-    values0 = subtypes[list(subtypes)[0]]
-    for subkey, values in subtypes.items():
-        if values != values0: return list()
+    values0 = subtypes[subkeys[0]]
+    for subkey in subkeys:
+        if subtypes[subkey] != values0: return list()
+
+    return subkeys
+
+########################################################################
+## Class templates shared by the subtypes of a liquid object
+########################################################################
+def extractBlock(blockKey, blockData, headerData, batch=True):
+    blockFunctions = extractBlockFunctions(blockKey, headerData)
+    constructor = extractFunctionData('constructor', blockData, lambda x: x == 'create', blockFunctions)[0]
+    destructor = extractFunctionData('destructor', blockData, lambda x: x == 'destroy', blockFunctions)[0]
+    initializers = extractFunctionData('initializers', blockData, None, blockFunctions)
+    setters = extractFunctionData('setters', blockData, lambda x: x.startswith('set_'), blockFunctions)
+    getters = extractFunctionData('getters', blockData, lambda x: x.startswith('get_'), blockFunctions)
+    getters = [g for g in getters if not g.params] #cant handle getters with pointers for outputs yet
+    getters = [g for g in getters if '*' not in g.data['rtnType']] #cant handle getters with pointer returns
+    activators = extractFunctionData('activators', blockData, lambda x: x == 'reset', blockFunctions)
+    inputs = extractPorts('inputs', 'in', blockData, blockFunctions)
+    outputs = extractPorts('outputs', 'out', blockData, blockFunctions)
+
+    #santy checks
+    assert(constructor)
+    assert(destructor)
+    assert(inputs)
+    assert(outputs)
+
+    #the design cache copies prototypes (<object>_copy), objects that
+    #can be created from their taps also keep the taps on disk
+    cache = None
+    if blockData.get('cache', False):
+        assert('copy' in blockFunctions)
+        cache = AttributeDict(functions=dict(copy=blockFunctions['copy']['name']), taps=None)
+        tapsKeys = ('create', 'get_length', 'copy_coefficients')
+        if constructor.key != 'create' and all([key in blockFunctions for key in tapsKeys]):
+            params = blockFunctions['create']['parameters']
+            if len(params) == 2 and params[0]['pointer']:
+                cache.taps = params[0]['type'].replace('*', '').strip()
+                cache.functions.update([(key, blockFunctions[key]['name']) for key in tapsKeys])
+
+    #work extraction
+    worker = extractWorker(blockData, blockFunctions, inputs, outputs, batch)
+
+    #in-place processing hands the input buffer to the output port
+    if worker.inplace:
+        assert(worker.mode == 'STANDARD_BLOCK')
+        assert(len(inputs) == 1 and len(outputs) == 1 and inputs[0].type == outputs[0].type)
+        assert(worker.decim == 1 and worker.interp == 1)
+
+    #filters with many taps run through a fast convolution object created from the taps
+    #of the direct form object: a liquid fftfilt (block FFT) by key, or the uniformly
+    #partitioned convolution when the yaml gives a partition size (latency of one partition),
+    #setters and activators that the fast convolution object also has are applied to both,
+    #the traits slots take the key as prefix since siblings may use different objects
+    fastconv = None
+    if 'fastconv' in blockData:
+        fastData = blockData['fastconv']
+        assert(worker.mode == 'STANDARD_BLOCK')
+        assert(len(inputs) == 1 and len(outputs) == 1)
+        assert(worker.decim == 1 and worker.interp == 1)
+        assert(all([key in blockFunctions for key in ('create', 'get_length', 'copy_coefficients', 'get_scale')]))
+        taps = blockFunctions['create']['parameters'][0]['type'].replace('*', '').strip()
+        fastKey = fastData.get('key', 'partconv')
+        if 'partition' in fastData:
+            #a partition size named like a parameter is an argument of the constructor only
+            partition = str(fastData['partition'])
+            if partition.startswith('_') and partition not in [param.name for param in constructor.params]:
+                param = AttributeDict(name=partition, type='unsigned int', default=blockData.get('defaults', {}).get(partition), base=None)
+                constructor.params.append(param)
+                constructor.externalParams.append(param)
+                constructor.paramTypesStr = ', '.join(['%s %s'%(param.type, param.name) for param in constructor.externalParams])
+                constructor.passArgsStr = ', '.join([param.name for param in constructor.externalParams])
+            fastType = 'LiquidPartitionedConv<%s, %s, %s>'%(inputs[0].type, taps, outputs[0].type)
+            fastFunctions = dict([(key, fastType+'::'+key) for key in ('create', 'destroy', 'execute', 'set_scale', 'reset')])
+            fastType += ' *'
+        else:
+            liquidFunctions = extractBlockFunctions(fastKey+blockKey[len(blockData['key']):], headerData)
+            fastType = liquidFunctions['create'].returns
+            fastFunctions = dict([(key, data['name']) for key, data in liquidFunctions.items()])
+        assert(all([key in fastFunctions for key in ('create', 'destroy', 'execute', 'set_scale')]))
+        fastconv = AttributeDict(
+            key = fastKey,
+            threshold = int(fastData.get('threshold', 0)),
+            partition = str(fastData.get('partition', 0)),
+            type = fastType,
+            taps = taps,
+            setters = [f.key for f in setters if f.key in fastFunctions],
+            activators = [f.key for f in activators if f.key in fastFunctions],
+            functions = dict([(key, blockFunctions[key]['name']) for key in ('get_length', 'copy_coefficients', 'get_scale')]))
+        for key in ['create', 'destroy', 'execute'] + fastconv.setters + fastconv.activators:
+            fastconv.functions[fastKey+'_'+key] = fastFunctions[key]
+
+    return AttributeDict(
+        constructor = constructor,
+        destructor = destructor,
+        initializers = initializers,
+        activators = activators,
+        cache = cache,
+        fastconv = fastconv,
+        setters = setters,
+        getters = getters,
+        inputs = inputs,
+        outputs = outputs,
+        worker = worker)
 
-    return subtypes.keys()
+def extractWorkNames(block):
+    #the names that the work calls and the port reserves refer to
+    worker = block.worker
+    exprs = [function.args for function in worker.functions] + [worker.decim, worker.interp, worker.factor]
+    exprs += [port.reserve for port in block.inputs + block.outputs if port.reserve is not None]
+    #the fast convolution of a filter is rebuilt from the partition size
+    if block.get('fastconv') is not None: exprs.append(block.fastconv.partition)
+    return set(re.findall(r'\w+', ' '.join(map(str, exprs))))
+
+def extractMembers(block):
+    #the block stores the setter arguments and the constructor
+    #arguments that the work calls and the port reserves refer to
+    used = extractWorkNames(block)
+    members = list()
+    for param in [p for function in block.initializers + block.setters for p in function.params] + \
+        [p for p in block.constructor.params if p.name in used]:
+        if param.name not in [m.name for m in members]: members.append(param)
+    return members
+
+def extractTypeSlots(block):
+    #(function key, slot name, header type) for everything typed in the block:
+    #parameters by name, ports by the work call parameter, returns by function key
+    yield None, 'object', block.constructor.returns
+    for function in [block.constructor] + block.initializers + block.setters:
+        for param in function.params:
+            if param.base is not None: yield function.key, param.name, param.base
+    for function in block.getters: yield function.key, function.key, function.returns
+    for port in block.inputs + block.outputs: yield port.fcnKey, port.slot, port.type
+
+def extractObject(resourceName, blockKey, siblings, headerData):
+    #the block entries of a yaml that wrap the same liquid object (the siblings)
+    #share one traits struct per subtype, and one class template when their
+    #class data matches, only the constructor differs between the siblings
+    index = getHeaderIndex(headerData)
+    cacheKey = (resourceName, blockKey, tuple(siblings.keys()))
+    if cacheKey in index.objects: return index.objects[cacheKey]
+
+    blocks = dict()
+    for blockName, blockData in siblings.items():
+        with profiled('subtypes'):
+            subtypes = blockData['subtypes'] if 'subtypes' in blockData else extractSubtypes(blockKey, headerData)
+        variants = list()
+        for subtype in subtypes or [None]:
+            with profiled('extract', subtype=subtype):
+                variants.append((subtype, extractBlock(blockKey+'_'+subtype if subtype else blockKey, blockData, headerData)))
+        #the subtypes share the work loop, batch calls only when every subtype has them
+        if len(set([variant.worker.mode for subtype, variant in variants])) > 1:
+            variants = [(subtype, extractBlock(blockKey+'_'+subtype if subtype else blockKey, blockData, headerData, False)) for subtype, variant in variants]
+        blocks[blockName] = AttributeDict(subtypes=subtypes, variants=variants)
+
+    #a name typed differently within a subtype gets the function key as prefix
+    slotTypes = dict()
+    for block in blocks.values():
+        for subtype, variant in block.variants:
+            variant.slots = list(extractTypeSlots(variant))
+            for owner, name, type in variant.slots:
+                slotTypes.setdefault((subtype, name), set()).add(type)
+    conflicts = set([name for (subtype, name), types in slotTypes.items() if len(types) > 1])
+    slotName = lambda owner, name: owner+name if name in conflicts else name
+
+    #bind the functions and the types of every subtype
+    traits = dict()
+    for block in blocks.values():
+        for subtype, variant in block.variants:
+            if subtype not in traits: traits[subtype] = AttributeDict(
+                name='liquid_%s_traits'%(blockKey+'_'+subtype if subtype else blockKey),
+                subtype=subtype, types=dict(), functions=dict())
+            entry = traits[subtype]
+            for owner, name, type in variant.slots: entry.types[slotName(owner, name)] = type
+            for function in [variant.constructor, variant.destructor] + variant.initializers + variant.setters + variant.getters + variant.activators:
+                entry.functions[function.key] = function.name
+            for function in variant.worker.functions: entry.functions[function.key] = function.call
+            if variant.cache is not None:
+                entry.functions.update(variant.cache.functions)
+                if variant.cache.taps is not None: entry.types['taps'] = variant.cache.taps
+            if variant.fastconv is not None:
+                entry.functions.update(variant.fastconv.functions)
+                entry.types['taps'] = variant.fastconv.taps
+                entry.types[variant.fastconv.key] = variant.fastconv.type
+
+    #only the slots typed differently across the subtypes go through the traits
+    slotTypes = dict()
+    for entry in traits.values():
+        for slot, type in entry.types.items(): slotTypes.setdefault(slot, list()).append(type)
+    varying = set([slot for slot, types in slotTypes.items() if len(types) != len(traits) or len(set(types)) > 1])
+    for entry in traits.values():
+        entry.typedefs = [(slot, type) for slot, type in entry.types.items() if slot in varying]
+
+    def slotType(owner, name, type):
+        slot = slotName(owner, name)
+        if slot not in varying: return type
+        return 'typename Traits::%s_type'%slot
+
+    def genericParam(owner, param):
+        if param.base is None or slotName(owner, param.name) not in varying: return param
+        slot = slotType(owner, param.name, param.base)
+        if param.typemap: return AttributeDict(param, type=param.typemap.replace('T', slot))
+        return AttributeDict(param, type=(slot+' '+param.stars).strip())
+
+    def genericFunction(function):
+        params = [genericParam(function.key, param) for param in function.params]
+        externalNames = [param.name for param in function.externalParams]
+        externalParams = [param for param in params if param.name in externalNames]
+        return AttributeDict(
+            key=function.key,
+            name='Traits::'+function.key,
+            returns=slotType(function.key, function.key, function.returns),
+            params=params,
+            externalParams=externalParams,
+            paramArgsStr=function.paramArgsStr,
+            paramTypesStr=', '.join(['%s %s'%(param.type, param.name) for param in externalParams]))
+
+    def genericPort(port):
+        type = slotType(port.fcnKey, port.slot, port.type)
+        return AttributeDict([(k, port[k]) for k in ('key', 'portVar', 'buffVar', 'alias', 'reserve')], type=type, portType=type)
+
+    #the class template renders from the class data alone,
+    #siblings with equal class data use the class of the first one
+    classes = dict()
+    for blockName, block in blocks.items():
+        subtype, variant = block.variants[0]
+        generic = AttributeDict(
+            constructor = genericFunction(variant.constructor),
+            initializers = [genericFunction(f) for f in variant.initializers],
+            setters = [genericFunction(f) for f in variant.setters],
+            inputs = [genericPort(port) for port in variant.inputs],
+            outputs = [genericPort(port) for port in variant.outputs],
+            worker = variant.worker,
+            fastconv = variant.fastconv)
+        members = extractMembers(generic)
+
+        #constructor arguments become calls that redesign the liquid object,
+        #unless liquid already has a call of that name or the block stores them
+        constructor = generic.constructor
+        keys = [f.key for f in [variant.destructor] + variant.initializers + variant.setters + variant.getters + variant.activators]
+        externalNames = [param.name for param in constructor.externalParams]
+        used = extractWorkNames(generic)
+        for param in constructor.params:
+            if param.name in used and param.name not in externalNames: used.update(re.findall(r'\w+', str(param.default)))
+        redesigners = [AttributeDict(key='set'+param.name, name=param.name, type=param.type)
+            for param in constructor.externalParams if 'set'+param.name not in keys and param.name not in used]
+        #the partition size of a fast convolution is not an argument of the design
+        designNames = [name for name in externalNames if variant.fastconv is None or name != variant.fastconv.partition]
+
+        #the constructor call, through the design cache when the block asks for it
+        design = 'Traits::%s(%s)'%(constructor.key, constructor.paramArgsStr)
+        if variant.cache is not None:
+            if variant.cache.taps is not None: design = \
+                'liquidDesignTaps<%s>(key, Traits::create, Traits::get_length, Traits::copy_coefficients, [&](void){return %s;})'%(
+                slotType(None, 'taps', variant.cache.taps), design)
+            design = 'liquidDesignCached(liquidDesignKey<Traits>(%s), Traits::copy, Traits::%s, [&](const std::string &key){return %s;})'%(
+                ', '.join(['"%s"'%constructor.key] + designNames), variant.destructor.key, design)
+
+        #the recent input replayed into a redesigned object carries over the filter state
+        carry = siblings[blockName].get('carry')
+        if carry is not None:
+            assert(variant.worker.mode == 'STANDARD_BLOCK')
+            assert(len(variant.inputs) == 1 and len(variant.outputs) == 1)
+            assert(variant.worker.decim == 1 and variant.worker.interp == 1)
+        fastconv = None
+        if variant.fastconv is not None: fastconv = AttributeDict(
+            key = variant.fastconv.key,
+            threshold = variant.fastconv.threshold,
+            partition = variant.fastconv.partition,
+            setter = 'set'+variant.fastconv.partition if variant.fastconv.partition in externalNames else None,
+            type = slotType(None, variant.fastconv.key, variant.fastconv.type),
+            taps = slotType(None, 'taps', variant.fastconv.taps),
+            setters = variant.fastconv.setters,
+            activators = variant.fastconv.activators)
+        block.classData = AttributeDict(
+            objectType = slotType(None, 'object', variant.constructor.returns),
+            members = [AttributeDict(name=m.name, type=m.type) for m in members],
+            destructor = 'Traits::'+variant.destructor.key,
+            initializers = [AttributeDict([(k, f[k]) for k in ('key', 'name', 'paramTypesStr', 'paramArgsStr')],
+                externalNames=[param.name for param in f.externalParams]) for f in generic.initializers],
+            setters = [AttributeDict([(k, f[k]) for k in ('key', 'name', 'paramTypesStr', 'paramArgsStr')],
+                externalNames=[param.name for param in f.externalParams],
+                externalTypes=[param.type for param in f.externalParams]) for f in generic.setters],
+            getters = [AttributeDict([(k, f[k]) for k in ('key', 'name', 'returns')]) for f in map(genericFunction, variant.getters)],
+            activators = ['Traits::'+f.key for f in variant.activators],
+            redesign = bool(redesigners),
+            carry = bool(redesigners) and carry is not None,
+            fastconv = fastconv,
+            inputs = generic.inputs,
+            outputs = generic.outputs,
+            worker = AttributeDict(
+                mode = variant.worker.mode,
+                inplace = variant.worker.inplace,
+                factor = variant.worker.factor,
+                decim = variant.worker.decim,
+                interp = variant.worker.interp,
+                functions = [AttributeDict(
+                    name = (f.target+' = ' if f.target else '')+'Traits::'+f.key,
+                    args = f.args) for f in variant.worker.functions]))
+        signature = repr(block.classData)
+        if signature not in classes: classes[signature] = 'liquid_%s_block'%blockName
+        block.classTemplate = classes[signature]
+
+        #the multi-channel class template runs the work calls of every channel in one work()
+        block.multiTemplate = None
+        if siblings[blockName].get('channels', False):
+            assert(block.classData.worker.mode == 'STANDARD_BLOCK')
+            block.multiTemplate = block.classTemplate[:-len('_block')]+'_multi_block'
+
+        #the factory creates the object and hands it to the class template,
+        #a block with redesign calls gets a designer that holds the constructor arguments
+        ctorNames = [param.name for param in constructor.params]
+        internals = [param for param in constructor.params if param.name not in externalNames]
+        memberArgs = [m.name if m.name in ctorNames else (str(m.default) if m.default is not None else '{}') for m in members]
+        designer = None
+        if redesigners: designer = AttributeDict(
+            name = 'liquid_%s_designer'%blockName,
+            params = [param for param in constructor.externalParams if param.name in designNames],
+            internals = internals,
+            memberInternals = [param for param in internals if param.name in memberArgs],
+            carry = carry,
+            redesigners = redesigners)
+        block.factoryData = AttributeDict(
+            constructor = constructor,
+            design = design,
+            internals = internals,
+            memberArgs = memberArgs,
+            designer = designer)
+
+    index.objects[cacheKey] = AttributeDict(blocks=blocks, traits=traits)
+    return index.objects[cacheKey]
 
 ########################################################################
 ## Invoke the generator
 ########################################################################
-from mako.template import Template
 import json
 import re
 
+#templates compiled by this process, keyed by template name
+TEMPLATES = dict()
+
+def getTemplate(name):
+    if name in TEMPLATES: return TEMPLATES[name]
+    from mako.template import Template
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tmpl', name)
+    if CACHE_DIR[0] is None: tmpl = Template(filename=path)
+    else:
+        #the module name contains a hash of the template contents,
+        #so an edited template never loads a stale compiled module
+        digest = hashlib.sha1(open(path, 'rb').read()).hexdigest()
+        moduleFilename = os.path.join(CACHE_DIR[0], '%s.%s.py'%(name.replace('.', '_'), digest))
+        tmpl = Template(filename=path, module_filename=moduleFilename)
+    TEMPLATES[name] = tmpl
+    return tmpl
+
 def generateBlockDesc(blockName, blockData, headerData, constructor, initializers, setters):
     desc = dict()
     desc['name'] = blockData['name']
@@ -262,7 +1270,7 @@ def generateBlockDesc(blockName, blockData, headerData, constructor, initializer
             args=[param.name for param in function.externalParams]))
 
     #enum mapping
-    enums = dict([(enum['name'], enum) for enum in headerData.enums])
+    enums = getHeaderIndex(headerData).enums
 
     #param documentation mapping
     blockDocs = list()
@@ -328,80 +1336,117 @@ def generateBlockDesc(blockName, blockData, headerData, constructor, initializer
 
             desc['params'].append(data)
 
+    #the setters also apply in batches through the configure() call
+    if setters: blockDocs.append('<p>configure() stages several setter calls, given as a list of [setter, value] pairs '
+        'that apply in list order, or as a dict that applies in setter name order. '
+        'The batch applies at the next work() or before the next direct call, and right away when the block is not active.</p>')
+
     desc['docs'] = blockDocs
     return desc
 
-def generateCpp1(blockKey, blockName, blockData, headerData, contentsLines):
-
-    blockFunctions = extractBlockFunctions(blockKey, headerData)
-    constructor = extractFunctionData('constructor', blockData, lambda x: x == 'create', blockFunctions)[0]
-    destructor = extractFunctionData('destructor', blockData, lambda x: x == 'destroy', blockFunctions)[0]
-    initializers = extractFunctionData('initializers', blockData, None, blockFunctions)
-    setters = extractFunctionData('setters', blockData, lambda x: x.startswith('set_'), blockFunctions)
-    getters = extractFunctionData('getters', blockData, lambda x: x.startswith('get_'), blockFunctions)
-    getters = [g for g in getters if not g.params] #cant handle getters with pointers for outputs yet
-    getters = [g for g in getters if '*' not in g.data['rtnType']] #cant handle getters with pointer returns
-    activators = extractFunctionData('activators', blockData, lambda x: x == 'reset', blockFunctions)
-    inputs = extractPorts('inputs', 'in', blockData, blockFunctions)
-    outputs = extractPorts('outputs', 'out', blockData, blockFunctions)
-
-    #santy checks
-    assert(constructor)
-    assert(destructor)
-    assert(inputs)
-    assert(outputs)
+def escapeCString(s, chunkSize=2048):
+    #json output is printable ascii: only the quote and the backslash need
+    #escapes, and the question marks so that no trigraph can form;
+    #one literal per chunk keeps far below the msvc string literal limits
+    chunks = list()
+    for i in range(0, len(s), chunkSize):
+        chunks.append(s[i:i+chunkSize].replace('\\', '\\\\').replace('"', '\\"').replace('?', '\\?'))
+    return chunks
+
+def generateRegistration(blockName, block, obj, blockDesc, channels):
+    if channels:
+        blockName += '_multi'
+        blockDesc = json.loads(json.dumps(blockDesc))
+        blockDesc['name'] += ' (Multi-Channel)'
+        blockDesc['path'] = '/liquid/'+blockName
+        index = 1 if block.subtypes else 0
+        blockDesc['params'].insert(index, dict(
+            key = 'numChannels',
+            name = 'Num Channels',
+            default = '2',
+            desc = ['Number of channels, each with its own ports and liquid object'],
+            preview = 'enable'))
+        blockDesc['args'].insert(index, 'numChannels')
+
+    #the single channel block also redesigns on the setter calls of constructor arguments,
+    #the multi-channel block creates every channel up front and has no redesign calls
+    designer = None if channels else block.factoryData.designer
+    if designer is not None:
+        blockDesc = json.loads(json.dumps(blockDesc))
+        blockDesc['calls'] += [dict(type='setter', name=r.key, args=[r.name]) for r in designer.redesigners]
+    blockClass = 'liquid_'+blockName+'_block'
+    factoryParams = ['const size_t numChannels'] if channels else []
+    factoryParams += ['%s %s'%(param.type, param.name) for param in block.factoryData.constructor.externalParams]
+
+    #dispatch on the data type to the factory for every subtype
+    factoryArgs = list()
+    subtypesArgs = list()
+    if block.subtypes:
+        for subtype, variant in block.variants:
+            types = (['size_t'] if channels else []) + [p.type for p in variant.constructor.externalParams]
+            subtypeFactoryArgs = ', '.join(['o%d.convert<%s>()'%(i, type) for i, type in enumerate(types)])
+            subtypesArgs.append((subtype, obj.traits[subtype].name, subtypeFactoryArgs))
+
+        factory = 'make_'+blockClass
+        factoryArgs = ['const std::string &type'] + ['const Pothos::Object &o%d'%i for i in range(len(blockDesc['args'])-1)]
+        factoryArgs = ', '.join(factoryArgs)
 
-    #work extraction
-    worker = extractWorker(blockData, blockFunctions, inputs, outputs)
+    #or just the single block entry
+    else: factory = 'create_%s<%s>'%(blockClass, obj.traits[None].name)
 
-    #block desc
-    blockDesc = generateBlockDesc(blockName, blockData, headerData, constructor, initializers, setters)
+    #encode the block description into C string literals
+    blockDescJson = json.dumps(blockDesc)
+    with profiled('escape'): blockDescChunks = escapeCString(blockDescJson)
 
-    #C++ class
-    blockClassTmplCpp = os.path.join(os.path.dirname(__file__), 'tmpl', 'LiquidBlockClass.tmpl.cpp')
-    tmplData = AttributeDict(
-        blockClass = 'liquid_'+blockName+'_block',
+    return AttributeDict(
+        blockClass = blockClass,
         blockName = blockName,
-        constructor = constructor,
-        destructor = destructor,
-        initializers = initializers,
-        activators = activators,
-        setters = setters,
-        getters = getters,
-        inputs = inputs,
-        outputs = outputs,
-        worker = worker)
-    outCpp = Template(open(blockClassTmplCpp).read()).render(**tmplData)
-
-    return outCpp, blockDesc, tmplData
+        classTemplate = block.multiTemplate if channels else block.classTemplate,
+        channels = channels,
+        designer = designer,
+        factory = factory,
+        factoryParams = ', '.join(factoryParams),
+        factoryArgs = factoryArgs,
+        subtypesArgs = subtypesArgs,
+        blockDescSize = len(blockDescJson),
+        blockDescChunks = blockDescChunks)
 
-def generateCpp(resourceName, blockName, blockData, headerData, contentsLines, siteInfo):
+def generateCpp(resourceName, blockName, blockData, headerData, contentsLines, siteInfo, siblings=None, sharedOutput=False):
 
     docKey = blockData.get('doc', resourceName)
     blockKey = blockData.get('key', blockName)
-    subtypes = blockData.get('subtypes', extractSubtypes(blockKey, headerData))
+    if siblings is None: siblings = {blockName: blockData}
+    with profiled('object'): obj = extractObject(resourceName, blockKey, siblings, headerData)
+    block = obj.blocks[blockName]
+    subtypes = block.subtypes
     if subtypes: notice('Processing %s: %s'%(blockName, subtypes))
     else: notice('Processing %s: [single block]'%(blockName))
-    factoryArgs = list()
-    subtypesArgs = list()
 
-    #generate class for every subtype
+    #block desc, the subtypes only differ in the types
+    subtype, variant = block.variants[-1]
+    with profiled('desc'): blockDesc = generateBlockDesc(blockName, blockData, headerData, variant.constructor, variant.initializers, variant.setters)
+
+    #the siblings before this block already emitted their classes when they share the output,
+    #the include guards keep the definitions unique when outputs are concatenated
+    emitted = set()
+    for name, other in obj.blocks.items():
+        if name == blockName or not sharedOutput: break
+        emitted.update([other.classTemplate, other.multiTemplate])
+        emitted.update([obj.traits[subtype].name for subtype, variant in other.variants])
+
+    #traits for every subtype and the class template they share
     blockClassesCpp = ""
+    with profiled('render'):
+        for subtype, variant in block.variants:
+            if obj.traits[subtype].name in emitted: continue
+            blockClassesCpp += getTemplate('LiquidBlockTraits.tmpl.cpp').render(traits=obj.traits[subtype])
+        if block.classTemplate not in emitted:
+            blockClassesCpp += getTemplate('LiquidBlockClass.tmpl.cpp').render(blockClass=block.classTemplate, **block.classData)
+        if block.multiTemplate not in emitted | set([None]):
+            blockClassesCpp += getTemplate('LiquidBlockMultiClass.tmpl.cpp').render(blockClass=block.multiTemplate, **block.classData)
+
+    #add subtypes to blockDesc
     if subtypes:
-        for subtype in subtypes:
-            outCpp, blockDesc, tmplData = generateCpp1(blockKey + '_' + subtype, blockName + '_' + subtype, blockData, headerData, contentsLines)
-            blockClassesCpp += outCpp
-            constructor = tmplData.constructor
-            subtypeFactoryArgs = ['o%d.convert<%s>()'%(i, p.type) for i, p in enumerate(constructor.externalParams)]
-            subtypeFactoryArgs = ', '.join(subtypeFactoryArgs)
-            subfactory = tmplData.blockClass
-            subtypesArgs.append((subtype, subfactory, subtypeFactoryArgs))
-
-        factory = 'make_liquid_'+blockName+'_block'
-        factoryArgs = ['const std::string &type'] + ['const Pothos::Object &o%d'%i for i in range(len(blockDesc['args']))]
-        factoryArgs = ', '.join(factoryArgs)
-
-        #add subtypes to blockDesc
         typeParam = dict(
             name = 'Data Types',
             key = 'dtype',
@@ -410,13 +1455,6 @@ def generateCpp(resourceName, blockName, blockData, headerData, contentsLines, s
             options = [dict(name=s.upper(), value='"%s"'%s) for s in subtypes])
         blockDesc['params'].insert(0, typeParam)
         blockDesc['args'].insert(0, 'dtype')
-        blockDesc['path'] = '/liquid/'+blockName
-
-    #or just the single block entry
-    else:
-        outCpp, blockDesc, tmplData = generateCpp1(blockKey, blockName, blockData, headerData, contentsLines)
-        factory = tmplData.blockClass+'::make'
-        blockClassesCpp += outCpp
 
     #refererence url and teaser docs
     blockSiteKey = 'doc/%s/'%docKey
@@ -430,62 +1468,282 @@ def generateCpp(resourceName, blockName, blockData, headerData, contentsLines, s
     url = 'http://liquidsdr.org/%s'%blockSiteKey
     blockDesc['docs'].append('<br/>Reference: <a href="%s">%s</a>'%(url, url))
 
-    #encode the block description into escaped JSON
-    blockDescEscaped = ''.join([hex(ord(ch)).replace('0x', '\\x') for ch in json.dumps(blockDesc)])
+    #the block and its multi-channel variant, which takes the channel count first
+    registrations = [generateRegistration(blockName, block, obj, blockDesc, False)]
+    if block.multiTemplate is not None:
+        registrations.append(generateRegistration(blockName, block, obj, blockDesc, True))
 
     #complete C++ source
-    registrationTmplCpp = os.path.join(os.path.dirname(__file__), 'tmpl', 'LiquidRegistration.tmpl.cpp')
-    outCpp = Template(open(registrationTmplCpp).read()).render(
-        blockClass = 'liquid_'+blockName+'_block',
-        blockName = blockName,
-        factory = factory,
-        factoryArgs = factoryArgs,
-        subtypesArgs = subtypesArgs,
-        blockClasses = blockClassesCpp,
-        blockDescEscaped = blockDescEscaped)
+    with profiled('render'): outCpp = getTemplate('LiquidRegistration.tmpl.cpp').render(
+        design = block.factoryData.design,
+        internals = block.factoryData.internals,
+        memberArgs = block.factoryData.memberArgs,
+        objectType = block.classData.objectType,
+        registrations = registrations,
+        blockClasses = blockClassesCpp)
 
     return outCpp
 
+########################################################################
+## Generator tasks (run serially or on a process pool)
+########################################################################
+
+#per-process state shared by the tasks, set once per worker process
+WORKER = AttributeDict()
+
+def initWorker(functions, enums, contentsLines, siteInfos, cacheDir, profile):
+    CACHE_DIR[0] = cacheDir
+    initProfile(profile)
+    WORKER.headerData = AttributeDict(functions=functions, enums=enums)
+    WORKER.contentsLines = contentsLines
+    WORKER.siteInfos = siteInfos
+
+def runEnumsTask():
+    LOG[0] = ""
+    with profiled('render', resource='ENUMS'): output = generateEnums(WORKER.headerData)
+    return [('ENUMS', output, LOG[0])], takeProfileRecords()
+
+def runBlockTask(resourceName, blocksData, siteDir, siblings, sharedOutput):
+    #the sibling blocks run in one task, so the liquid object they share
+    #is extracted once and every block renders from the same extracted data
+    siteInfo = WORKER.siteInfos.get(siteDir) or dict()
+    outputs = list()
+    for blockName, blockData in blocksData.items():
+        LOG[0] = ""
+        with profiled('block', resource=resourceName, block=blockName):
+            output = generateCpp(resourceName, blockName, blockData, WORKER.headerData, WORKER.contentsLines, siteInfo, siblings, sharedOutput)
+        outputs.append((blockName, output, LOG[0]))
+    return outputs, takeProfileRecords()
+
+class SerialPool(object):
+    #same interface as the process pool, but runs the tasks in this process
+
+    class Result(object):
+        def __init__(self, value): self.value = value
+        def get(self): return self.value
+
+    def __init__(self, initializer, initargs): initializer(*initargs)
+    def apply_async(self, func, args=()): return SerialPool.Result(func(*args))
+    def close(self): pass
+    def join(self): pass
+
 ########################################################################
 ## Generator entry point
 ########################################################################
+import argparse
 import sys
-import yaml
-
-if __name__ == '__main__':
-    liquidH = sys.argv[1]
-    resourceIn = sys.argv[2]
-    outputDest = sys.argv[3]
-    header('Begin parsing and generation: %s -> %s'%(os.path.basename(resourceIn), os.path.basename(outputDest)))
 
-    #parse the header
-    contentsH = open(liquidH).read()
-    contentsLines = contentsH.splitlines()
-    headerData = parseHeader(contentsH)
+def writeIfChanged(path, contents):
+    #leave the file and its mtime untouched when the contents match
+    #so that the build system can skip recompiling generated sources
+    try:
+        if open(path).read() == contents: return False
+    except (IOError, OSError): pass
+    open(path, 'w').write(contents)
+    return True
+
+def readSiteInfo(siteDir):
+    siteJson = os.path.join(siteDir, 'site.json')
+    if not os.path.exists(siteJson): return None
+    return json.loads(open(siteJson).read())
+
+def generateEnums(headerData):
+    #anonymous enums (the log levels) have no type to convert to
+    return getTemplate('LiquidEnums.tmpl.cpp').render(enums=[enum for enum in headerData.enums if 'name' in enum])
+
+def loadBlocksData(resourceIn):
+    import yaml
+    #the LibYAML based loader is much faster when available
+    loader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+    blocksData = yaml.load(open(resourceIn).read(), Loader=loader)
+    if blocksData is None:
+        warning('%s is empty'%resourceIn)
+        blocksData = dict()
+    return blocksData
+
+def extractSiblings(blockName, blocksData):
+    #the block entries that wrap the same liquid object, including this one,
+    #taken from the whole yaml so that every shard renders the same classes
+    blockKey = blocksData[blockName].get('key', blockName)
+    return dict([(name, data) for name, data in blocksData.items() if data.get('key', name) == blockKey])
 
-    #parse site.json
-    siteInfo = dict()
-    siteJson = os.path.join(os.path.dirname(outputDest), 'site.json')
-    if os.path.exists(siteJson): siteInfo = json.loads(open(siteJson).read())
-    else: warning('Site info not found, doc teasers will be missing!')
+########################################################################
+## Shard the generated sources
+########################################################################
+def splitResource(resourceIn):
+    #a blocks yaml file, optionally limited to one block: blocks.yaml:blockName
+    match = re.match(r'(.*\.yaml):(\w+)$', resourceIn)
+    if match: return match.group(1), match.group(2)
+    return resourceIn, None
+
+def planOutputs(resources, outputDir, shard, unitySize):
+    #resource/output pairs for the policy: one source per yaml, one per block,
+    #or yamls with fewer than unitySize blocks grouped into unity sources
+    pairs = list()
+    group = list()
+    groupBlocks = 0
+    unities = 0
+    for resourceIn in resources + [None]:
+        if resourceIn is not None:
+            name = os.path.splitext(os.path.basename(resourceIn))[0]
+            blockNames = list(loadBlocksData(resourceIn).keys())
+            if shard == 'unity' and len(blockNames) < unitySize:
+                group.append(resourceIn)
+                groupBlocks += len(blockNames)
+            elif shard == 'block' and len(blockNames) > 1:
+                for blockName in blockNames:
+                    pairs.append(('%s:%s'%(resourceIn, blockName), os.path.join(outputDir, '%s.%s.cpp'%(name, blockName))))
+            else: pairs.append((resourceIn, os.path.join(outputDir, name+'.cpp')))
+
+        #a full group (or the last one) becomes a unity source
+        if group and (resourceIn is None or groupBlocks >= unitySize):
+            if len(group) == 1: outputDest = os.path.join(outputDir, os.path.splitext(os.path.basename(group[0]))[0]+'.cpp')
+            else:
+                outputDest = os.path.join(outputDir, 'unity_%d.cpp'%unities)
+                unities += 1
+            pairs.extend([(r, outputDest) for r in group])
+            group = list()
+            groupBlocks = 0
+    return pairs
 
-    if resourceIn == "ENUMS":
-        enumsTmplCpp = os.path.join(os.path.dirname(__file__), 'tmpl', 'LiquidEnums.tmpl.cpp')
-        output = Template(open(enumsTmplCpp).read()).render(enums=headerData.enums)
-        open(outputDest, 'w').write(output)
+if __name__ == '__main__':
 
-    else:
+    parser = argparse.ArgumentParser(description='Generate Pothos blocks from the liquid DSP header')
+    parser.add_argument('liquidH', help='preprocessed liquid.h')
+    parser.add_argument('resources', nargs='+', metavar='resource output',
+        help='pairs of a blocks yaml file, ENUMS, HEADER, or CACHE and the output path')
+    parser.add_argument('--cache-dir', default=None,
+        help='directory for compiled templates and lexer tables (default: next to liquidH)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+        help='number of generator processes (0 for one per CPU)')
+    parser.add_argument('--targeted', action='store_true',
+        help='only parse the header declarations used by the given resources')
+    parser.add_argument('--parser', choices=['cpp', 'scan', 'check'], default='cpp',
+        help='read the header with CppHeaderParser, the fast scanner (opt-in), or both and compare them')
+    parser.add_argument('--profile', action='store_true',
+        help='write the wall and CPU time of the generator phases to <output>.profile.json')
+    parser.add_argument('--shard', choices=['yaml', 'block', 'unity'], default='yaml',
+        help='generated sources for --plan: one per yaml, one per block, or unity groups of small yamls')
+    parser.add_argument('--unity-size', type=int, default=8,
+        help='number of blocks that fill a unity source')
+    parser.add_argument('--plan', metavar='outputDir', default=None,
+        help='print the resource/output pairs for the yaml resources as a CMake list and exit')
+    args = parser.parse_args()
+    initProfile(args.profile)
+    liquidH = args.liquidH
+    resources = args.resources
+
+    if args.plan is not None:
+        pairs = planOutputs(resources, args.plan, args.shard, args.unity_size)
+        sys.stdout.write(';'.join([x.replace('\\', '/') for pair in pairs for x in pair]))
+        sys.exit(0)
+    if len(resources)%2 != 0: parser.error('resources must be given as resource/output pairs')
 
-        #parse the blocks
-        resourceName =  os.path.splitext(os.path.basename(resourceIn))[0]
-        blocksData = yaml.load(open(resourceIn).read(), Loader=yaml.FullLoader)
-        if blocksData is None:
-            warning('%s is empty'%resourceIn)
-            blocksData = dict()
-
-        #run the generator
-        output = ""
-        for blockName, blockData in blocksData.items():
-            output += generateCpp(resourceName, blockName, blockData, headerData, contentsLines, siteInfo)
-        open(outputDest, 'w').write(output)
-        open(outputDest+'.log', 'w').write(LOG[0])
+    contentsH = open(liquidH).read()
+    contentsLines = contentsH.splitlines()
+    CACHE_DIR[0] = args.cache_dir
+    if CACHE_DIR[0] is None: CACHE_DIR[0] = os.path.join(os.path.dirname(os.path.abspath(liquidH)), 'LiquidBlocksGen.cache')
+
+    #the log prefix for each output, emitted in this process
+    outputs = list()
+    blocksCache = dict()
+    prefixes = set()
+    names = set()
+    allEnums = False
+    for resourceIn, outputDest in zip(resources[0::2], resources[1::2]):
+        LOG[0] = ""
+        header('Begin parsing and generation: %s -> %s'%(os.path.basename(resourceIn), os.path.basename(outputDest)))
+
+        if resourceIn == "CACHE":
+            loadHeader(contentsH, outputDest, args.parser)
+            continue
+
+        #the shared header of the generated sources needs no header data
+        if resourceIn == "HEADER":
+            writeIfChanged(outputDest, getTemplate('LiquidBlocks.tmpl.hpp').render())
+            continue
+
+        siteDir = os.path.dirname(outputDest)
+        if readSiteInfo(siteDir) is None: warning('Site info not found, doc teasers will be missing!')
+
+        if resourceIn == "ENUMS":
+            tasks = [(runEnumsTask, ())]
+            order = ['ENUMS']
+            allEnums = True
+        else:
+            resourcePath, selected = splitResource(resourceIn)
+            resourceName =  os.path.splitext(os.path.basename(resourcePath))[0]
+            if resourcePath not in blocksCache:
+                with profiled('yaml', resource=resourceName): blocksCache[resourcePath] = loadBlocksData(resourcePath)
+            allBlocksData = blocksCache[resourcePath]
+            blocksData = allBlocksData if selected is None else {selected: allBlocksData[selected]}
+            #one task for each group of siblings, the outputs merge in yaml order
+            groups = dict()
+            for blockName, blockData in blocksData.items():
+                groups.setdefault(blockData.get('key', blockName), dict())[blockName] = blockData
+            tasks = [(runBlockTask, (resourceName, group, siteDir, extractSiblings(next(iter(group)), allBlocksData), selected is None)) for group in groups.values()]
+            order = list(blocksData.keys())
+            blockPrefixes, blockNames = extractHeaderSymbols(blocksData)
+            prefixes.update(blockPrefixes)
+            names.update(blockNames)
+        outputs.append((resourceIn, outputDest, LOG[0], order, tasks))
+
+    if not outputs: sys.exit(0)
+
+    #parse the header or load it from the cache
+    if args.targeted:
+        selection = hashlib.sha1(repr((sorted(prefixes), sorted(names), allEnums)).encode('utf-8')).hexdigest()[:16]
+        with profiled('select'): selectedH = selectHeader(contentsH, prefixes, names, allEnums)
+        headerData = loadHeader(selectedH, headerCachePath(liquidH, selection), args.parser)
+    else: headerData = loadHeader(contentsH, headerCachePath(liquidH), args.parser)
+    mainRecords = takeProfileRecords()
+
+    #fan out one task per block entry, the results are collected in order
+    siteInfos = dict()
+    for resourceIn, outputDest, log, order, tasks in outputs:
+        siteDir = os.path.dirname(outputDest)
+        if siteDir not in siteInfos: siteInfos[siteDir] = readSiteInfo(siteDir)
+    initArgs = (headerData.functions, headerData.enums, contentsLines, siteInfos, CACHE_DIR[0], args.profile)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    numTasks = sum([len(tasks) for resourceIn, outputDest, log, order, tasks in outputs])
+    if jobs > 1 and numTasks > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(min(jobs, numTasks), initWorker, initArgs)
+    else: pool = SerialPool(initWorker, initArgs)
+    results = [[pool.apply_async(func, taskArgs) for func, taskArgs in tasks] for resourceIn, outputDest, log, order, tasks in outputs]
+    pool.close()
+
+    #merge the generated sources and the logs in resource order,
+    #resources that share an output (unity sources) are concatenated
+    merged = dict()
+    for (resourceIn, outputDest, log, order, tasks), taskResults in zip(outputs, results):
+        if outputDest not in merged: merged[outputDest] = AttributeDict(output="", log="", hasLog=False, resources=list(), records=list(), recordIds=set())
+        entry = merged[outputDest]
+        resourceName = os.path.splitext(os.path.basename(splitResource(resourceIn)[0]))[0]
+        entry.resources.append(resourceName)
+        #the header records without a resource go once into every output
+        for record in mainRecords or []:
+            if record.get('resource', resourceName) != resourceName or id(record) in entry.recordIds: continue
+            entry.recordIds.add(id(record))
+            entry.records.append(record)
+        entry.hasLog = entry.hasLog or resourceIn != "ENUMS"
+        entry.log += log
+        blockOutputs = dict()
+        for result in taskResults:
+            taskOutputs, taskRecords = result.get()
+            for blockName, taskOutput, taskLog in taskOutputs: blockOutputs[blockName] = (taskOutput, taskLog)
+            entry.records += taskRecords or []
+        for blockName in order:
+            entry.output += blockOutputs[blockName][0]
+            entry.log += blockOutputs[blockName][1]
+
+    for outputDest, entry in merged.items():
+        with profiled('write', output=os.path.basename(outputDest)):
+            writeIfChanged(outputDest, entry.output)
+            if entry.hasLog: writeIfChanged(outputDest+'.log', entry.log)
+
+        #the header phases are shared, they repeat in every report
+        if PROFILE[0] is not None:
+            profile = dict(resources=entry.resources, header=PROFILE[0].header, records=entry.records+takeProfileRecords())
+            writeIfChanged(outputDest+'.profile.json', json.dumps(profile, indent=2, sort_keys=True))
+    pool.join()
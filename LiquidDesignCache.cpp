@@ -0,0 +1,150 @@
+// SPDX-License-Identifier: BSL-1.0
+
+#include "LiquidDesignCache.hpp"
+#include <Pothos/Plugin.hpp>
+
+#include <Poco/Format.h>
+
+#include <complex> //need complex before liquid
+#include <liquid/liquid.h>
+
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <functional>
+#include <list>
+#include <mutex>
+#include <thread>
+#include <unordered_map>
+#include <utility>
+
+/***********************************************************************
+ * memory tier: prototypes in least recently used order
+ **********************************************************************/
+struct LiquidDesignCacheState
+{
+    LiquidDesignCacheState(void):
+        capacity(256),
+        hits(0),
+        misses(0),
+        diskHits(0),
+        diskMisses(0)
+    {
+        const char *size = std::getenv("LIQUID_BLOCKS_DESIGN_CACHE_SIZE");
+        if (size != nullptr) capacity = std::strtoul(size, nullptr, 10);
+        const char *dir = std::getenv("LIQUID_BLOCKS_DESIGN_CACHE_DIR");
+        if (dir != nullptr) directory = dir;
+    }
+
+    std::mutex mutex;
+    size_t capacity;
+    std::string directory;
+    std::list<std::pair<std::string, std::shared_ptr<void>>> entries;
+    std::unordered_map<std::string, decltype(entries)::iterator> index;
+    unsigned long long hits, misses, diskHits, diskMisses;
+};
+
+static LiquidDesignCacheState &getState(void)
+{
+    static LiquidDesignCacheState state;
+    return state;
+}
+
+std::shared_ptr<void> LiquidDesignCache::find(const std::string &key)
+{
+    auto &state = getState();
+    std::lock_guard<std::mutex> lock(state.mutex);
+    const auto it = state.index.find(key);
+    if (it == state.index.end())
+    {
+        state.misses++;
+        return nullptr;
+    }
+    state.hits++;
+    state.entries.splice(state.entries.begin(), state.entries, it->second);
+    return it->second->second;
+}
+
+void LiquidDesignCache::insert(const std::string &key, const std::shared_ptr<void> &prototype)
+{
+    auto &state = getState();
+    std::lock_guard<std::mutex> lock(state.mutex);
+    if (state.capacity == 0 || state.index.count(key) != 0) return;
+    while (state.entries.size() >= state.capacity)
+    {
+        state.index.erase(state.entries.back().first);
+        state.entries.pop_back();
+    }
+    state.entries.emplace_front(key, prototype);
+    state.index[key] = state.entries.begin();
+}
+
+/***********************************************************************
+ * disk tier: one file per key with the key and the taps,
+ * the liquid version is part of the key so an upgrade misses
+ **********************************************************************/
+static std::string getPath(const std::string &directory, const std::string &key)
+{
+    const auto hash = std::hash<std::string>()(key);
+    return Poco::format("%s/%s.taps", directory, Poco::format("%016?x", hash));
+}
+
+static std::string getDiskKey(const std::string &key)
+{
+    return std::string(::liquid_libversion()) + '\0' + key;
+}
+
+bool LiquidDesignCache::load(const std::string &key, std::string &data)
+{
+    auto &state = getState();
+    if (state.directory.empty()) return false;
+    const auto diskKey = getDiskKey(key);
+    std::ifstream file(getPath(state.directory, diskKey), std::ios::binary);
+    std::string contents((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+    const bool hit = contents.size() > diskKey.size() && contents.compare(0, diskKey.size(), diskKey) == 0;
+    if (hit) data = contents.substr(diskKey.size());
+
+    std::lock_guard<std::mutex> lock(state.mutex);
+    if (hit) state.diskHits++;
+    else state.diskMisses++;
+    return hit;
+}
+
+void LiquidDesignCache::store(const std::string &key, const void *data, const size_t size)
+{
+    auto &state = getState();
+    if (state.directory.empty()) return;
+    const auto diskKey = getDiskKey(key);
+
+    //written under a temporary name so that a reader never sees a partial file
+    const auto path = getPath(state.directory, diskKey);
+    const auto tmpPath = Poco::format("%s.%?x", path, std::hash<std::thread::id>()(std::this_thread::get_id()));
+    {
+        std::ofstream file(tmpPath, std::ios::binary);
+        file.write(diskKey.data(), diskKey.size());
+        file.write(static_cast<const char *>(data), size);
+        if (!file) return;
+    }
+    if (std::rename(tmpPath.c_str(), path.c_str()) != 0) std::remove(tmpPath.c_str());
+}
+
+/***********************************************************************
+ * statistics for the registry
+ **********************************************************************/
+static std::string getDesignCacheStats(void)
+{
+    auto &state = getState();
+    std::lock_guard<std::mutex> lock(state.mutex);
+    return Poco::format(
+        "{\"hits\": %?u, \"misses\": %?u, \"size\": %?u, \"capacity\": %?u, "
+        "\"disk hits\": %?u, \"disk misses\": %?u}",
+        state.hits, state.misses, state.entries.size(), state.capacity,
+        state.diskHits, state.diskMisses);
+}
+
+pothos_static_block(registerLiquidDesignCache)
+{
+    Pothos::PluginRegistry::addCall(
+        "/liquid/design_cache/stats",
+        &getDesignCacheStats);
+}
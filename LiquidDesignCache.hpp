@@ -0,0 +1,103 @@
+// SPDX-License-Identifier: BSL-1.0
+
+#pragma once
+#include <cstddef>
+#include <memory>
+#include <string>
+#include <typeinfo>
+#include <vector>
+
+/***********************************************************************
+ * Process-wide cache of designed liquid objects:
+ * blocks constructed with the same arguments copy one prototype
+ * (liquid <object>_copy) instead of running the filter design again.
+ *
+ * The memory tier is a LRU bounded by LIQUID_BLOCKS_DESIGN_CACHE_SIZE
+ * prototypes (default 256). Objects that can be created from their taps
+ * also store the taps in LIQUID_BLOCKS_DESIGN_CACHE_DIR when it is set,
+ * so that a restarted process skips the design entirely.
+ **********************************************************************/
+namespace LiquidDesignCache
+{
+    //the prototype for the key or null, counted as a hit or a miss
+    std::shared_ptr<void> find(const std::string &key);
+
+    //add a prototype, the least recently used one is dropped when full
+    void insert(const std::string &key, const std::shared_ptr<void> &prototype);
+
+    //taps stored under the key in the cache directory (disk tier)
+    bool load(const std::string &key, std::string &data);
+    void store(const std::string &key, const void *data, const size_t size);
+}
+
+/***********************************************************************
+ * cache keys: the traits type, the constructor, and the argument bytes
+ **********************************************************************/
+inline void liquidDesignKeyAppend(std::string &)
+{
+    return;
+}
+
+template <typename T, typename... Args>
+void liquidDesignKeyAppend(std::string &key, const std::vector<T> &value, const Args &... args);
+
+template <typename T, typename... Args>
+void liquidDesignKeyAppend(std::string &key, const T &value, const Args &... args)
+{
+    key.append(reinterpret_cast<const char *>(&value), sizeof(value));
+    liquidDesignKeyAppend(key, args...);
+}
+
+template <typename T, typename... Args>
+void liquidDesignKeyAppend(std::string &key, const std::vector<T> &value, const Args &... args)
+{
+    const size_t size = value.size();
+    key.append(reinterpret_cast<const char *>(&size), sizeof(size));
+    key.append(reinterpret_cast<const char *>(value.data()), size*sizeof(T));
+    liquidDesignKeyAppend(key, args...);
+}
+
+template <typename Traits, typename... Args>
+std::string liquidDesignKey(const char *constructor, const Args &... args)
+{
+    std::string key(typeid(Traits).name());
+    key.append(1, '\0').append(constructor).append(1, '\0');
+    liquidDesignKeyAppend(key, args...);
+    return key;
+}
+
+/***********************************************************************
+ * designs through the cache
+ **********************************************************************/
+template <typename Copy, typename Destroy, typename Design>
+auto liquidDesignCached(const std::string &key, Copy copy, Destroy destroy, Design design) -> decltype(design(key))
+{
+    typedef decltype(design(key)) Object;
+    auto prototype = LiquidDesignCache::find(key);
+    if (!prototype)
+    {
+        Object q = design(key);
+        if (q == nullptr) return q;
+        prototype.reset(q, [destroy](void *p){destroy(static_cast<Object>(p));});
+        LiquidDesignCache::insert(key, prototype);
+    }
+    return copy(static_cast<Object>(prototype.get()));
+}
+
+template <typename Taps, typename Create, typename Length, typename CopyTaps, typename Design>
+auto liquidDesignTaps(const std::string &key, Create create, Length length, CopyTaps copyTaps, Design design) -> decltype(design())
+{
+    std::string data;
+    if (LiquidDesignCache::load(key, data) && data.size() >= sizeof(Taps))
+    {
+        std::vector<Taps> taps(data.size()/sizeof(Taps));
+        data.copy(reinterpret_cast<char *>(taps.data()), taps.size()*sizeof(Taps));
+        return create(taps.data(), taps.size());
+    }
+    auto q = design();
+    if (q == nullptr) return q;
+    std::vector<Taps> taps(length(q));
+    copyTaps(q, taps.data());
+    LiquidDesignCache::store(key, taps.data(), taps.size()*sizeof(Taps));
+    return q;
+}
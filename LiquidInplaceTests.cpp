@@ -0,0 +1,128 @@
+// SPDX-License-Identifier: BSL-1.0
+
+#include <Pothos/Framework.hpp>
+#include <Pothos/Proxy.hpp>
+#include <Pothos/Testing.hpp>
+
+#include <complex> //need complex before liquid
+#include <liquid/liquid.h>
+
+#include <cstdlib>
+#include <functional>
+#include <string>
+#include <vector>
+
+/***********************************************************************
+ * In-place work: a block with an unshared input buffer processes it in place,
+ * a block with a shared input buffer (fanned out upstream) takes the copy path.
+ * Both have to produce the same samples at the same label positions,
+ * and the shared buffer has to reach the other readers unmodified.
+ **********************************************************************/
+static const size_t NUM_ELEMS = 4096;
+static const std::vector<unsigned long long> LABEL_INDEXES = {0, 1000, 4000};
+
+struct InplaceRun
+{
+    Pothos::BufferChunk output;
+    std::vector<Pothos::Label> labels;
+    Pothos::BufferChunk tapped;
+};
+
+static Pothos::BufferChunk randomBuffer(const std::string &dtype)
+{
+    Pothos::BufferChunk buffer(dtype, NUM_ELEMS);
+    const auto p = buffer.as<float *>();
+    for (size_t i = 0; i < buffer.length/sizeof(float); i++) p[i] = std::rand()/float(RAND_MAX) - 0.5f;
+    return buffer;
+}
+
+static InplaceRun runTopology(const Pothos::Proxy &block, const std::string &dtype, const Pothos::BufferChunk &input, const bool shared)
+{
+    auto feeder = Pothos::BlockRegistry::make("/blocks/feeder_source", dtype);
+    auto collector = Pothos::BlockRegistry::make("/blocks/collector_sink", dtype);
+    auto tap = Pothos::BlockRegistry::make("/blocks/collector_sink", dtype);
+
+    //the test holds a reference to the fed buffer,
+    //the copier posts buffers that only the downstream blocks reference
+    auto copier = Pothos::BlockRegistry::make("/blocks/copier", dtype);
+
+    feeder.call("feedBuffer", input);
+    for (const auto index : LABEL_INDEXES) feeder.call("feedLabel", Pothos::Label("mark", index, index));
+
+    {
+        Pothos::Topology topology;
+        topology.connect(feeder, 0, copier, 0);
+        topology.connect(copier, 0, block, 0);
+        topology.connect(block, 0, collector, 0);
+        if (shared) topology.connect(copier, 0, tap, 0);
+        topology.commit();
+        POTHOS_TEST_TRUE(topology.waitInactive());
+    }
+
+    InplaceRun run;
+    run.output = collector.call<Pothos::BufferChunk>("getBuffer");
+    run.labels = collector.call<std::vector<Pothos::Label>>("getLabels");
+    if (shared) run.tapped = tap.call<Pothos::BufferChunk>("getBuffer");
+    return run;
+}
+
+static void testInplace(const std::function<Pothos::Proxy(void)> &makeBlock, const std::string &dtype, const Pothos::BufferChunk &input)
+{
+    const auto unique = runTopology(makeBlock(), dtype, input, false);
+    const auto shared = runTopology(makeBlock(), dtype, input, true);
+
+    //the same samples on both paths
+    POTHOS_TEST_EQUAL(unique.output.elements(), NUM_ELEMS);
+    POTHOS_TEST_EQUAL(shared.output.elements(), NUM_ELEMS);
+    const auto numFloats = unique.output.length/sizeof(float);
+    for (size_t i = 0; i < numFloats; i++)
+    {
+        POTHOS_TEST_CLOSE(unique.output.as<const float *>()[i], shared.output.as<const float *>()[i], 1e-6);
+    }
+
+    //the labels stay at their input positions
+    POTHOS_TEST_EQUAL(unique.labels.size(), LABEL_INDEXES.size());
+    POTHOS_TEST_EQUAL(shared.labels.size(), LABEL_INDEXES.size());
+    for (size_t i = 0; i < LABEL_INDEXES.size(); i++)
+    {
+        POTHOS_TEST_EQUAL(unique.labels[i].index, LABEL_INDEXES[i]);
+        POTHOS_TEST_EQUAL(shared.labels[i].index, LABEL_INDEXES[i]);
+    }
+
+    //the other reader of the shared buffer sees the input
+    POTHOS_TEST_EQUAL(shared.tapped.elements(), NUM_ELEMS);
+    for (size_t i = 0; i < numFloats; i++)
+    {
+        POTHOS_TEST_EQUAL(shared.tapped.as<const float *>()[i], input.as<const float *>()[i]);
+    }
+}
+
+POTHOS_TEST_BLOCK("/liquid/tests", test_inplace_firfilt)
+{
+    const std::vector<float> taps = {0.5f, 0.25f, -0.125f, 0.0625f, 0.03125f};
+    const auto input = randomBuffer("float32");
+    testInplace([&](void){return Pothos::BlockRegistry::make("/liquid/firfilt", "rrrf", taps);}, "float32", input);
+
+    //and both match the liquid filter run directly
+    const auto run = runTopology(Pothos::BlockRegistry::make("/liquid/firfilt", "rrrf", taps), "float32", input, false);
+    std::vector<float> h(taps), expected(NUM_ELEMS);
+    auto q = firfilt_rrrf_create(h.data(), h.size());
+    firfilt_rrrf_execute_block(q, input.as<float *>(), NUM_ELEMS, expected.data());
+    firfilt_rrrf_destroy(q);
+    for (size_t i = 0; i < NUM_ELEMS; i++)
+    {
+        POTHOS_TEST_CLOSE(run.output.as<const float *>()[i], expected[i], 1e-6);
+    }
+}
+
+POTHOS_TEST_BLOCK("/liquid/tests", test_inplace_iirfilt_lowpass)
+{
+    const auto input = randomBuffer("complex_float32");
+    testInplace([](void){return Pothos::BlockRegistry::make("/liquid/iirfilt_lowpass", "crcf", 4, 0.1f);}, "complex_float32", input);
+}
+
+POTHOS_TEST_BLOCK("/liquid/tests", test_inplace_agc)
+{
+    const auto input = randomBuffer("complex_float32");
+    testInplace([](void){return Pothos::BlockRegistry::make("/liquid/agc", "crcf");}, "complex_float32", input);
+}
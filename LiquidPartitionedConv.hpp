@@ -0,0 +1,128 @@
+// SPDX-License-Identifier: BSL-1.0
+
+#pragma once
+#include <complex> //need complex before liquid
+#include <liquid/liquid.h>
+#include <algorithm>
+#include <vector>
+
+/***********************************************************************
+ * Uniformly partitioned convolution (overlap-save) with the interface
+ * of a liquid fftfilt object: the taps are split into partitions of n,
+ * each one a spectrum of size 2n, and execute() filters n samples.
+ *
+ * The latency is one partition instead of the whole filter,
+ * and the cost per sample is about log(n) + taps/n.
+ **********************************************************************/
+template <typename In, typename Taps, typename Out>
+class LiquidPartitionedConv
+{
+public:
+    typedef std::complex<float> Complex;
+
+    static LiquidPartitionedConv *create(Taps *h, unsigned int h_len, unsigned int n)
+    {
+        return new LiquidPartitionedConv(h, h_len, n);
+    }
+
+    static int destroy(LiquidPartitionedConv *q)
+    {
+        delete q;
+        return 0;
+    }
+
+    static int reset(LiquidPartitionedConv *q)
+    {
+        std::fill(q->_time.begin(), q->_time.end(), Complex(0));
+        std::fill(q->_X.begin(), q->_X.end(), Complex(0));
+        return 0;
+    }
+
+    static int set_scale(LiquidPartitionedConv *q, Taps scale)
+    {
+        q->_scale = Complex(scale)/float(2*q->_n);
+        return 0;
+    }
+
+    static int execute(LiquidPartitionedConv *q, In *x, Out *y)
+    {
+        const size_t n = q->_n, N = 2*n;
+
+        //the last two blocks of input, into the newest slot of the delay line
+        std::copy(q->_time.begin()+n, q->_time.end(), q->_time.begin());
+        std::copy(x, x+n, q->_time.begin()+n);
+        q->_head = (q->_head+q->_numParts-1)%q->_numParts;
+        std::copy(q->_time.begin(), q->_time.end(), q->_buff.begin());
+        fft_execute(q->_forward);
+        std::copy(q->_freq.begin(), q->_freq.end(), q->_X.begin()+q->_head*N);
+
+        //partition k filters the spectrum of the input from k blocks ago
+        std::fill(q->_freq.begin(), q->_freq.end(), Complex(0));
+        for (size_t k = 0; k < q->_numParts; k++)
+        {
+            const Complex *H = q->_H.data()+k*N;
+            const Complex *X = q->_X.data()+((q->_head+k)%q->_numParts)*N;
+            for (size_t i = 0; i < N; i++) q->_freq[i] += H[i]*X[i];
+        }
+
+        //the second half of the circular convolution is the linear one
+        fft_execute(q->_backward);
+        for (size_t i = 0; i < n; i++) store(y[i], q->_buff[n+i]*q->_scale);
+        return 0;
+    }
+
+private:
+    LiquidPartitionedConv(Taps *h, unsigned int h_len, unsigned int n):
+        _n(std::max(n, 1u)),
+        _numParts(std::max<size_t>((h_len+_n-1)/_n, 1)),
+        _head(0),
+        _scale(Complex(1)/float(2*_n)),
+        _H(_numParts*2*_n),
+        _X(_numParts*2*_n),
+        _time(2*_n),
+        _buff(2*_n),
+        _freq(2*_n)
+    {
+        _forward = fft_create_plan(2*_n, _buff.data(), _freq.data(), LIQUID_FFT_FORWARD, 0);
+        _backward = fft_create_plan(2*_n, _freq.data(), _buff.data(), LIQUID_FFT_BACKWARD, 0);
+
+        //the spectrum of each partition, zero padded to 2n
+        for (size_t k = 0; k < _numParts; k++)
+        {
+            std::fill(_buff.begin(), _buff.end(), Complex(0));
+            for (size_t i = 0; i < _n && k*_n+i < h_len; i++) _buff[i] = Complex(h[k*_n+i]);
+            fft_execute(_forward);
+            std::copy(_freq.begin(), _freq.end(), _H.begin()+k*2*_n);
+        }
+        std::fill(_buff.begin(), _buff.end(), Complex(0));
+        std::fill(_freq.begin(), _freq.end(), Complex(0));
+    }
+
+    ~LiquidPartitionedConv(void)
+    {
+        fft_destroy_plan(_forward);
+        fft_destroy_plan(_backward);
+    }
+
+    static void store(float &y, const Complex &v)
+    {
+        y = v.real();
+    }
+
+    static void store(Complex &y, const Complex &v)
+    {
+        y = v;
+    }
+
+    const size_t _n;
+    const size_t _numParts;
+    size_t _head;
+    Complex _scale;
+    std::vector<Complex> _H; //partition spectra
+    std::vector<Complex> _X; //frequency domain delay line
+    std::vector<Complex> _time;
+    std::vector<Complex> _buff;
+    std::vector<Complex> _freq;
+    fftplan _forward;
+    fftplan _backward;
+};
@@ -0,0 +1,250 @@
+########################################################################
+## Benchmark the block generator without a liquid-dsp install
+########################################################################
+#liquid.h.gz is the liquid-dsp 1.8.3 liquid.h preprocessed like the build:
+#StripInclude.py, then g++ -E -CC -P -ffreestanding (no libc preamble).
+#The scaled headers repeat every function declaration under renamed
+#objects, so the header grows while the generated blocks stay the same.
+#
+#Compare against the baseline: python bench/LiquidBlocksBench.py
+#Record a new baseline:        python bench/LiquidBlocksBench.py --update
+#Check targeted generation:    python bench/LiquidBlocksBench.py --check-targeted
+#The baseline holds CPU times of one machine, record it before comparing.
+#Each time is the median of --repeat runs, with the median absolute deviation
+#of the runs as its noise. A slowdown counts as a regression when it exceeds
+#--tolerance of the baseline and --noise times the noise of both runs.
+
+import os
+import sys
+import re
+import io
+import json
+import gzip
+import time
+import statistics
+import platform
+import argparse
+import tempfile
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, SOURCE_DIR)
+import LiquidBlocksGen
+
+FIXTURE = os.path.join(BENCH_DIR, 'liquid.h.gz')
+BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+BLOCKS_DIR = os.path.join(SOURCE_DIR, 'blocks')
+
+########################################################################
+## Headers and blocks
+########################################################################
+def loadFixture():
+    return gzip.open(FIXTURE, 'rb').read().decode('utf-8')
+
+def scaleHeader(contents, scale):
+    #each function declaration is followed by its copies,
+    #the object name gets a suffix so that the copies are new functions
+    pieces = list()
+    end = 0
+    for span in LiquidBlocksGen.indexHeader(contents):
+        if span.kind != 'function': continue
+        decl = contents[span.start:span.end]
+        pieces.append(contents[end:span.end])
+        end = span.end
+        obj, sep, rest = span.name.partition('_')
+        for i in range(2, scale+1):
+            name = '%sx%d%s%s'%(obj, i, sep, rest)
+            pieces.append(re.sub(r'\b%s\b'%span.name, name, decl))
+    pieces.append(contents[end:])
+    return ''.join(pieces)
+
+def loadBlocks():
+    blocks = list()
+    for name in sorted(os.listdir(BLOCKS_DIR)):
+        if not name.endswith('.yaml'): continue
+        resourceName = os.path.splitext(name)[0]
+        blocksData = LiquidBlocksGen.loadBlocksData(os.path.join(BLOCKS_DIR, name))
+        for blockName, blockData in blocksData.items():
+            blocks.append((resourceName, blockName, blockData, LiquidBlocksGen.extractSiblings(blockName, blocksData)))
+    return blocks
+
+########################################################################
+## Benchmarks
+########################################################################
+def freshHeader(headerData):
+    #the function index is cached in the header data, start without it
+    return LiquidBlocksGen.AttributeDict(functions=headerData.functions, enums=headerData.enums)
+
+def benchParseHeader(contents, headerData, blocks):
+    LiquidBlocksGen.reduceHeader(LiquidBlocksGen.parseHeader(contents))
+
+def benchScanHeader(contents, headerData, blocks):
+    LiquidBlocksGen.scanHeader(contents)
+
+def benchExtractBlockFunctions(contents, headerData, blocks):
+    headerData = freshHeader(headerData)
+    for resourceName, blockName, blockData, siblings in blocks:
+        blockKey = blockData.get('key', blockName)
+        LiquidBlocksGen.extractBlockFunctions(blockKey, headerData)
+        for subtype in blockData.get('subtypes', LiquidBlocksGen.extractSubtypes(blockKey, headerData)):
+            LiquidBlocksGen.extractBlockFunctions(blockKey+'_'+subtype, headerData)
+
+def benchGenerateCpp(contents, headerData, blocks):
+    headerData = freshHeader(headerData)
+    contentsLines = contents.splitlines()
+    for resourceName, blockName, blockData, siblings in blocks:
+        LiquidBlocksGen.generateCpp(resourceName, blockName, blockData, headerData, contentsLines, dict(), siblings, True)
+
+def benchEnums(contents, headerData, blocks):
+    LiquidBlocksGen.generateEnums(freshHeader(headerData))
+
+BENCHMARKS = [
+    ('parseHeader', benchParseHeader),
+    ('scanHeader', benchScanHeader),
+    ('extractBlockFunctions', benchExtractBlockFunctions),
+    ('generateCpp', benchGenerateCpp),
+    ('ENUMS', benchEnums),
+]
+
+@contextlib.contextmanager
+def quiet():
+    #the generator logs and the parser warnings are discarded
+    LiquidBlocksGen.LOG[0] = ""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()): yield
+
+def timeBench(bench, args, repeat):
+    #the median of the runs and their median absolute deviation
+    times = list()
+    for i in range(repeat):
+        with quiet():
+            t = time.process_time()
+            bench(*args)
+            times.append(time.process_time() - t)
+    median = statistics.median(times)
+    return median, statistics.median([abs(t - median) for t in times])
+
+def runBenchmarks(scales, repeat):
+    fixture = loadFixture()
+    blocks = loadBlocks()
+    results = dict()
+    noise = dict()
+    for scale in scales:
+        contents = scaleHeader(fixture, scale)
+        headerData = LiquidBlocksGen.scanHeader(contents)
+        args = (contents, headerData, blocks)
+
+        #compile the templates and the lexer tables before timing
+        if not results:
+            with quiet():
+                for name, bench in BENCHMARKS: bench(*args)
+
+        key = 'x%d'%scale
+        results[key] = dict()
+        noise[key] = dict()
+        for name, bench in BENCHMARKS:
+            results[key][name], noise[key][name] = timeBench(bench, args, repeat)
+            sys.stdout.write('%-4s %-22s %d functions %9.4fs +-%.4fs\n'%(
+                key, name, len(headerData.functions), results[key][name], noise[key][name]))
+            sys.stdout.flush()
+    return results, noise
+
+########################################################################
+## Targeted generation
+########################################################################
+def checkTargeted():
+    #every yaml generated from only the declarations selected for it
+    #(--targeted) matches the generation from the whole header
+    fixture = loadFixture()
+    contentsLines = fixture.splitlines()
+    fullData = LiquidBlocksGen.scanHeader(fixture)
+    failures = list()
+    for name in sorted(os.listdir(BLOCKS_DIR)):
+        if not name.endswith('.yaml'): continue
+        resourceName = os.path.splitext(name)[0]
+        blocksData = LiquidBlocksGen.loadBlocksData(os.path.join(BLOCKS_DIR, name))
+        prefixes, names = LiquidBlocksGen.extractHeaderSymbols(blocksData)
+        with quiet(): targetedData = LiquidBlocksGen.scanHeader(LiquidBlocksGen.selectHeader(fixture, prefixes, names, False))
+        for blockName, blockData in blocksData.items():
+            siblings = LiquidBlocksGen.extractSiblings(blockName, blocksData)
+            outputs = list()
+            for headerData in (fullData, targetedData):
+                try:
+                    with quiet(): outputs.append(LiquidBlocksGen.generateCpp(resourceName, blockName, blockData,
+                        freshHeader(headerData), contentsLines, dict(), siblings, True))
+                except Exception as ex: outputs.append('%s: %s'%(type(ex).__name__, ex))
+            status = 'ok' if outputs[0] == outputs[1] else 'MISMATCH'
+            if outputs[0] != outputs[1]: failures.append((resourceName, blockName))
+            sys.stdout.write('%-12s %-26s %s\n'%(resourceName, blockName, status))
+    return failures
+
+########################################################################
+## Baseline comparison
+########################################################################
+def compareBaseline(results, noise, baseline, tolerance, noiseFactor):
+    regressions = list()
+    sys.stdout.write('\n%-4s %-22s %9s %9s %7s\n'%('', 'benchmark', 'time[s]', 'base[s]', 'ratio'))
+    for key in sorted(results, key=lambda k: int(k[1:])):
+        for name, bench in BENCHMARKS:
+            t = results[key][name]
+            base = baseline.get('results', dict()).get(key, dict()).get(name)
+            if base is None:
+                sys.stdout.write('%-4s %-22s %9.4f %9s %7s\n'%(key, name, t, '-', '-'))
+                continue
+            ratio = t/base if base else float('inf')
+            flag = ''
+            #the slowdown has to stand out of the run to run noise of both sides,
+            #and a millisecond of jitter on the short benchmarks is not a regression
+            spread = noise[key][name] + baseline.get('noise', dict()).get(key, dict()).get(name, 0.0)
+            if ratio > 1.0 + tolerance and t - base > max(noiseFactor*spread, 0.001):
+                flag = ' REGRESSION'
+                regressions.append((key, name))
+            sys.stdout.write('%-4s %-22s %9.4f %9.4f %7.2f%s\n'%(key, name, t, base, ratio, flag))
+    return regressions
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark the block generator on the liquid.h fixture')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 5, 10],
+        help='header sizes as multiples of the fixture functions')
+    parser.add_argument('--repeat', type=int, default=7,
+        help='runs per benchmark, the median time is kept')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+        help='slowdown over the baseline reported as a regression')
+    parser.add_argument('--noise', type=float, default=3.0,
+        help='multiple of the run to run deviation that a regression has to exceed')
+    parser.add_argument('--baseline', default=BASELINE,
+        help='baseline file to compare with or to update')
+    parser.add_argument('--update', action='store_true',
+        help='record the results as the new baseline')
+    parser.add_argument('--check-targeted', action='store_true',
+        help='compare the targeted generation of every yaml with the whole header and exit')
+    parser.add_argument('--cache-dir', default=os.path.join(tempfile.gettempdir(), 'LiquidBlocksBench.cache'),
+        help='directory for compiled templates and lexer tables')
+    args = parser.parse_args()
+
+    LiquidBlocksGen.CACHE_DIR[0] = args.cache_dir
+    if args.check_targeted:
+        failures = checkTargeted()
+        if failures: sys.stdout.write('\n%d blocks differ with --targeted\n'%len(failures))
+        sys.exit(1 if failures else 0)
+
+    results, noise = runBenchmarks(args.scales, args.repeat)
+
+    baseline = dict()
+    if os.path.exists(args.baseline): baseline = json.loads(open(args.baseline).read())
+    regressions = compareBaseline(results, noise, baseline, args.tolerance, args.noise)
+
+    if args.update:
+        baseline = dict(
+            machine=platform.machine(),
+            platform=platform.platform(),
+            python=platform.python_version(),
+            repeat=args.repeat,
+            results=dict(baseline.get('results', dict()), **results),
+            noise=dict(baseline.get('noise', dict()), **noise))
+        open(args.baseline, 'w').write(json.dumps(baseline, indent=2, sort_keys=True)+'\n')
+        sys.stdout.write('\nBaseline written to %s\n'%args.baseline)
+    elif regressions:
+        sys.stdout.write('\n%d benchmarks regressed by more than %d%%\n'%(len(regressions), args.tolerance*100))
+        sys.exit(1)
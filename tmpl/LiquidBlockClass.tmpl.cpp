@@ -1,31 +1,23 @@
+#ifndef ${blockClass.upper()}_DEFINED
+#define ${blockClass.upper()}_DEFINED
+template <typename Traits>
 class ${blockClass} : public Pothos::Block
 {
 public:
 
-    static Block *make(${constructor.paramTypesStr})
-    {
-        return new ${blockClass}(${constructor.passArgsStr});
-    }
-
-    ${blockClass}(${constructor.paramTypesStr}):
-        % for param in constructor.params:
-        % if param in constructor.externalParams:
-        ${param.name}(${param.name}),
-        % else:
-        ${param.name}(${param.default}),
-        % endif
+    ${blockClass}(${', '.join([objectType+' q'] + ['%s %s'%(member.type, member.name) for member in members])}):
+        % for member in members:
+        ${member.name}(${member.name}),
         % endfor
-        % for function in initializers + setters:
-        % for param in function.params:
-        % if param not in constructor.params and param.default is not None:
-        ${param.name}(${param.default}),
+        _q(q)${',' if fastconv is not None or carry else ''}
+        % if carry:
+        _carry(0)${',' if fastconv is not None else ''}
+        % endif
+        % if fastconv is not None:
+        _fast(nullptr),
+        _fastLen(0)
         % endif
-        % endfor
-        % endfor
-        _q(nullptr)
     {
-        _q = ${constructor.name}(${constructor.paramArgsStr});
-
         //setup ports
         % for setupFcn, ports in [('setupInput', inputs), ('setupOutput', outputs)]:
         % for port in ports:
@@ -43,31 +35,255 @@ public:
         % for function in initializers + setters + getters:
         this->registerCall(this, "${function.key}", &${blockClass}::${function.key});
         % endfor
+        % if fastconv is not None and fastconv.setter is not None:
+        this->registerCall(this, "${fastconv.setter}", &${blockClass}::${fastconv.setter});
+        % endif
+        % if setters:
+        this->registerCall(this, "configure", &${blockClass}::configure);
+        % endif
 
         //register probes on this block
         % for function in getters:
         this->registerProbe("${function.key}", "probe_${function.key}", "${function.key}_triggered");
         % endfor
+        % if fastconv is not None:
+
+        //long filters run through the fast convolution object
+        this->updateFastConv();
+        % endif
     }
 
     ~${blockClass}(void)
     {
-        ${destructor.name}(_q);
+        % if redesign:
+        //wait for the designs still running and destroy them
+        if (_redesign.valid()) _superseded.push_back(std::move(_redesign));
+        for (auto &design : _superseded) this->destroyDesign(design);
+        % endif
+        ${destructor}(_q);
+        % if fastconv is not None:
+        if (_fast != nullptr) Traits::${fastconv.key}_destroy(_fast);
+        % endif
     }
 
     % for function in initializers + setters:
     void ${function.key}(${function.paramTypesStr})
     {
-        % for param in function.externalParams:
-        this->${param.name} = ${param.name};
+        % if setters:
+        this->applyStaged();
+        % endif
+        % for name in function.externalNames:
+        this->${name} = ${name};
         % endfor
+        % if redesign:
+        _replay["${function.key}"] = [=](void){this->${function.key}(${', '.join(function.externalNames)});};
+        % endif
         ${function.name}(_q, ${function.paramArgsStr});
+        % if fastconv is not None and function.key in fastconv.setters:
+        if (_fast != nullptr) Traits::${fastconv.key}_${function.key}(_fast, ${function.paramArgsStr});
+        % elif fastconv is not None:
+        this->updateFastConv();
+        % endif
     }
     % endfor
 
+    % if redesign:
+    template <typename Designer>
+    void setDesigner(const Designer &designer)
+    {
+        _designer = designer;
+        % if carry:
+        _carry = designer.carry();
+        % endif
+    }
+
+    template <typename Designer, typename Type>
+    void registerRedesign(const std::string &name, Type Designer::*arg)
+    {
+        //the call sets one argument of the designer and designs again,
+        //the argument keeps its value when the design fails right away
+        this->registerCallable(name, Pothos::Callable(std::function<void(Type)>([=](Type value)
+        {
+            % if setters:
+            this->applyStaged();
+            % endif
+            Designer *designer = _designer.template target<Designer>();
+            const Type previous = designer->*arg;
+            designer->*arg = value;
+            try
+            {
+                this->redesign(name);
+            }
+            catch (...)
+            {
+                designer->*arg = previous;
+                throw;
+            }
+            % if carry:
+            _carry = designer->carry();
+            % endif
+        })));
+    }
+
+    void redesign(const std::string &name)
+    {
+        //a design that is still running is superseded,
+        //work() destroys it once it is ready without waiting on it
+        this->reapDesigns();
+        if (_redesign.valid()) _superseded.push_back(std::move(_redesign));
+
+        //an inactive block designs right away and the call reports a failure,
+        //an active one designs on a helper thread from a copy of the designer,
+        //work() swaps the new object in or reports the failure
+        _redesignCall = name;
+        if (this->isActive()) _redesign = std::async(std::launch::async, _designer);
+        else this->swapDesign(this->checkDesign(_designer()));
+    }
+
+    ${objectType} checkDesign(${objectType} q)
+    {
+        if (q == nullptr) throw Pothos::InvalidArgumentException("${blockClass}::"+_redesignCall+"()", "design failed");
+        return q;
+    }
+
+    void swapDesign(${objectType} q)
+    {
+        //the new object takes over the filter state and the setters since the design
+        ${destructor}(_q);
+        _q = q;
+        % if carry:
+        if (!_history.empty())
+        {
+            std::vector<${outputs[0].type}> scratch(_history.size());
+            ${inputs[0].type} *${inputs[0].buffVar} = _history.data();
+            ${outputs[0].type} *${outputs[0].buffVar} = scratch.data();
+            const unsigned int N = _history.size();
+            % for function in worker.functions:
+            ${function.name}(_q, ${function.args});
+            % endfor
+        }
+        % endif
+        const auto replay = _replay;
+        for (const auto &call : replay) call.second();
+        % if fastconv is not None:
+        this->updateFastConv();
+        % endif
+    }
+
+    void reapDesigns(void)
+    {
+        //destroy the superseded designs that are ready
+        for (auto it = _superseded.begin(); it != _superseded.end();)
+        {
+            if (it->wait_for(std::chrono::seconds(0)) != std::future_status::ready) it++;
+            else
+            {
+                this->destroyDesign(*it);
+                it = _superseded.erase(it);
+            }
+        }
+    }
+
+    void destroyDesign(std::future<${objectType}> &design)
+    {
+        try
+        {
+            ${objectType} q = design.get();
+            if (q != nullptr) ${destructor}(q);
+        }
+        catch (...) {}
+    }
+
+    % endif
+    % if fastconv is not None and fastconv.setter is not None:
+    void ${fastconv.setter}(const unsigned int ${fastconv.partition})
+    {
+        % if setters:
+        this->applyStaged();
+        % endif
+        this->${fastconv.partition} = ${fastconv.partition};
+        this->updateFastConv();
+    }
+
+    % endif
+    % if fastconv is not None:
+    void updateFastConv(void)
+    {
+        //long filters run on whole blocks of the fast convolution object,
+        //the direct form object keeps the taps and the scale for the getters
+        if (_fast != nullptr) Traits::${fastconv.key}_destroy(_fast);
+        _fast = liquidFastConv<${fastconv.taps}>(_q, Traits::get_length, Traits::copy_coefficients, Traits::get_scale,
+            Traits::${fastconv.key}_create, Traits::${fastconv.key}_set_scale, ${fastconv.threshold}, ${fastconv.partition}, _fastLen);
+        ${inputs[0].portVar}->setReserve(_fast == nullptr ? 0 : _fastLen);
+        ${outputs[0].portVar}->setReserve(_fast == nullptr ? 0 : _fastLen);
+        % if carry:
+        if (_fast == nullptr || _history.empty()) return;
+
+        //whole blocks of zeros that end with the history prime the overlap
+        std::vector<${inputs[0].type}> block(((_history.size()+_fastLen-1)/_fastLen)*_fastLen);
+        std::vector<${outputs[0].type}> scratch(_fastLen);
+        std::copy(_history.begin(), _history.end(), block.end()-_history.size());
+        for (size_t i = 0; i < block.size(); i += _fastLen)
+        {
+            Traits::${fastconv.key}_execute(_fast, block.data()+i, scratch.data());
+        }
+        % endif
+    }
+
+    % endif
+    % if carry:
+    void recordHistory(const ${inputs[0].type} *x, const size_t N)
+    {
+        //keep the last input samples for a redesigned object
+        const size_t H = _carry;
+        if (N >= H) _history.assign(x+N-H, x+N);
+        else _history.insert(_history.end(), x, x+N);
+        if (_history.size() > H) _history.erase(_history.begin(), _history.end()-H);
+    }
+
+    % endif
+    % if setters:
+    void configure(const Pothos::Object &config)
+    {
+        //convert the whole batch before staging any of it, the staged setters
+        //apply together in order at the next work() or before the next direct call,
+        //and right away when the block is not active
+        std::vector<std::function<void(void)>> staged;
+        for (const auto &pair : liquidConfigPairs(config))
+        {
+            % for function in setters:
+            if (pair.first == "${function.key}")
+            {
+                const auto args = liquidConfigArgs(pair.first, pair.second, ${len(function.externalTypes)});
+                % for i, type in enumerate(function.externalTypes):
+                const auto a${i} = args[${i}].convert<${type}>();
+                % endfor
+                staged.push_back([=](void){this->${function.key}(${', '.join(['a%d'%i for i in range(len(function.externalTypes))])});});
+                continue;
+            }
+            % endfor
+            throw Pothos::InvalidArgumentException("configure("+pair.first+")", "unknown setter");
+        }
+        _staged.insert(_staged.end(), staged.begin(), staged.end());
+        if (!this->isActive()) this->applyStaged();
+    }
+
+    void applyStaged(void)
+    {
+        //the configuration staged before a direct call or a work() applies first,
+        //so the calls take effect in the order they were made
+        std::vector<std::function<void(void)>> staged;
+        staged.swap(_staged);
+        for (const auto &apply : staged) apply();
+    }
+
+    % endif
     % for function in getters:
     ${function.returns} ${function.key}(void)
     {
+        % if setters:
+        this->applyStaged();
+        % endif
         return ${function.name}(_q);
     }
     % endfor
@@ -75,12 +291,34 @@ public:
     void activate(void)
     {
         % for activator in activators:
-        ${activator.name}(_q);
+        ${activator}(_q);
+        % endfor
+        % if fastconv is not None:
+        % for activator in fastconv.activators:
+        if (_fast != nullptr) Traits::${fastconv.key}_${activator}(_fast);
         % endfor
+        % if len(fastconv.activators) != len(activators):
+        this->updateFastConv();
+        % endif
+        % endif
     }
 
     void work(void)
     {
+        % if setters:
+        //apply the configuration staged since the last work()
+        this->applyStaged();
+
+        % endif
+        % if redesign:
+        //swap in the object designed by the helper thread
+        this->reapDesigns();
+        if (_redesign.valid() && _redesign.wait_for(std::chrono::seconds(0)) == std::future_status::ready)
+        {
+            this->swapDesign(this->checkDesign(_redesign.get()));
+        }
+
+        % endif
         //get pointers to port buffers
         % for port in inputs + outputs:
         ${port.type} *${port.buffVar} = ${port.portVar}->buffer();
@@ -119,8 +357,49 @@ public:
         numRead = N;
 
         % elif worker.mode == 'STANDARD_BLOCK':
+        % if fastconv is not None:
+        //the fast convolution object consumes and produces whole blocks
+        if (_fast != nullptr)
+        {
+            const unsigned int N = (std::min(numAvailableIn, numAvailableOut)/_fastLen)*_fastLen;
+            if (N == 0) return;
+            % if carry:
+            this->recordHistory(${inputs[0].buffVar}, N);
+            % endif
+            for (unsigned int i = 0; i < N; i += _fastLen)
+            {
+                Traits::${fastconv.key}_execute(_fast, ${inputs[0].buffVar}+i, ${outputs[0].buffVar}+i);
+            }
+            ${inputs[0].portVar}->consume(N);
+            ${outputs[0].portVar}->produce(N);
+            return;
+        }
+
+        % endif
+        % if worker.inplace:
+        //this block holds the only reference to the input buffer:
+        //process the buffer in place and forward it downstream
+        if (numAvailableIn != 0 && ${inputs[0].portVar}->buffer().unique())
+        {
+            auto buffer = ${inputs[0].portVar}->takeBuffer();
+            ${inputs[0].buffVar} = ${outputs[0].buffVar} = buffer.as<${inputs[0].type} *>();
+            const unsigned int N = buffer.elements();
+            % if carry:
+            this->recordHistory(${inputs[0].buffVar}, N);
+            % endif
+            % for function in worker.functions:
+            ${function.name}(_q, ${function.args});
+            % endfor
+            ${outputs[0].portVar}->postBuffer(std::move(buffer));
+            return;
+        }
+
+        % endif
         unsigned int N = std::min(numAvailableIn/${worker.decim}, numAvailableOut/${worker.interp});
         if (N == 0) return;
+        % if carry:
+        this->recordHistory(${inputs[0].buffVar}, N);
+        % endif
         % for function in worker.functions:
         ${function.name}(_q, ${function.args});
         % endfor
@@ -148,17 +427,32 @@ public:
     }
 
 private:
-    % for param in constructor.params:
-    ${param.type} ${param.name};
+    % for member in members:
+    ${member.type} ${member.name};
     % endfor
-    % for function in initializers + setters:
-    % for param in function.params:
-    % if param not in constructor.params:
-    ${param.type} ${param.name};
+    % if setters:
+    std::vector<std::function<void(void)>> _staged;
+    % endif
+    % if redesign:
+    std::function<${objectType}(void)> _designer;
+    std::future<${objectType}> _redesign;
+    std::list<std::future<${objectType}>> _superseded;
+    std::map<std::string, std::function<void(void)>> _replay;
+    % endif
+    % if carry:
+    std::vector<${inputs[0].type}> _history;
+    % endif
+    ${objectType} _q;
+    % if redesign:
+    std::string _redesignCall;
+    % endif
+    % if carry:
+    size_t _carry;
+    % endif
+    % if fastconv is not None:
+    ${fastconv.type} _fast;
+    unsigned int _fastLen;
     % endif
-    % endfor
-    % endfor
-    ${constructor.returns} _q;
 
     % for input in inputs:
     Pothos::InputPort *${input.portVar};
@@ -167,3 +461,4 @@ private:
     Pothos::OutputPort *${output.portVar};
     % endfor
 };
+#endif //${blockClass.upper()}_DEFINED
@@ -0,0 +1,253 @@
+#ifndef ${blockClass.upper()}_DEFINED
+#define ${blockClass.upper()}_DEFINED
+template <typename Traits>
+class ${blockClass} : public Pothos::Block
+{
+public:
+
+    ${blockClass}(${', '.join(['const std::vector<%s> &q'%objectType] + ['%s %s'%(member.type, member.name) for member in members])}):
+        % for member in members:
+        ${member.name}(${member.name}),
+        % endfor
+        _q(q)${',' if fastconv is not None else ''}
+        % if fastconv is not None:
+        _fastLen(0)
+        % endif
+    {
+        //setup ports, one of each per channel
+        for (size_t ch = 0; ch < _q.size(); ch++)
+        {
+            % for setupFcn, ports in [('setupInput', inputs), ('setupOutput', outputs)]:
+            % for port in ports:
+            ${port.portVar}.push_back(this->${setupFcn}("${port.key}"+std::to_string(ch), typeid(${port.portType})));
+            % if port.alias is not None:
+            ${port.portVar}.back()->setAlias("${port.alias}"+std::to_string(ch));
+            % endif
+            % if port.reserve is not None:
+            ${port.portVar}.back()->setReserve(${port.reserve});
+            % endif
+            % endfor
+            % endfor
+        }
+
+        //register calls on this block
+        % for function in initializers + setters + getters:
+        this->registerCall(this, "${function.key}", &${blockClass}::${function.key});
+        % endfor
+        % if fastconv is not None and fastconv.setter is not None:
+        this->registerCall(this, "${fastconv.setter}", &${blockClass}::${fastconv.setter});
+        % endif
+        % if setters:
+        this->registerCall(this, "configure", &${blockClass}::configure);
+        % endif
+
+        //register probes on this block
+        % for function in getters:
+        this->registerProbe("${function.key}", "probe_${function.key}", "${function.key}_triggered");
+        % endfor
+        % if fastconv is not None:
+
+        //long filters run through the fast convolution objects
+        this->updateFastConv();
+        % endif
+    }
+
+    ~${blockClass}(void)
+    {
+        for (auto q : _q) ${destructor}(q);
+        % if fastconv is not None:
+        for (auto fast : _fast) if (fast != nullptr) Traits::${fastconv.key}_destroy(fast);
+        % endif
+    }
+
+    % for function in initializers + setters:
+    void ${function.key}(${function.paramTypesStr})
+    {
+        % if setters:
+        this->applyStaged();
+        % endif
+        % for name in function.externalNames:
+        this->${name} = ${name};
+        % endfor
+        for (auto q : _q) ${function.name}(q, ${function.paramArgsStr});
+        % if fastconv is not None and function.key in fastconv.setters:
+        for (auto fast : _fast) if (fast != nullptr) Traits::${fastconv.key}_${function.key}(fast, ${function.paramArgsStr});
+        % elif fastconv is not None:
+        this->updateFastConv();
+        % endif
+    }
+    % endfor
+
+    % if fastconv is not None and fastconv.setter is not None:
+    void ${fastconv.setter}(const unsigned int ${fastconv.partition})
+    {
+        % if setters:
+        this->applyStaged();
+        % endif
+        this->${fastconv.partition} = ${fastconv.partition};
+        this->updateFastConv();
+    }
+
+    % endif
+    % if fastconv is not None:
+    void updateFastConv(void)
+    {
+        //long filters run on whole blocks of the fast convolution objects,
+        //the direct form objects keep the taps and the scale for the getters
+        for (auto fast : _fast) if (fast != nullptr) Traits::${fastconv.key}_destroy(fast);
+        _fast.clear();
+        for (auto q : _q) _fast.push_back(liquidFastConv<${fastconv.taps}>(q, Traits::get_length, Traits::copy_coefficients, Traits::get_scale,
+            Traits::${fastconv.key}_create, Traits::${fastconv.key}_set_scale, ${fastconv.threshold}, ${fastconv.partition}, _fastLen));
+        % for port in inputs + outputs:
+        for (auto port : ${port.portVar}) port->setReserve(_fast.front() == nullptr ? 0 : _fastLen);
+        % endfor
+    }
+
+    % endif
+    % if setters:
+    void configure(const Pothos::Object &config)
+    {
+        //convert the whole batch before staging any of it, the staged setters
+        //apply together in order at the next work() or before the next direct call,
+        //and right away when the block is not active
+        std::vector<std::function<void(void)>> staged;
+        for (const auto &pair : liquidConfigPairs(config))
+        {
+            % for function in setters:
+            if (pair.first == "${function.key}")
+            {
+                const auto args = liquidConfigArgs(pair.first, pair.second, ${len(function.externalTypes)});
+                % for i, type in enumerate(function.externalTypes):
+                const auto a${i} = args[${i}].convert<${type}>();
+                % endfor
+                staged.push_back([=](void){this->${function.key}(${', '.join(['a%d'%i for i in range(len(function.externalTypes))])});});
+                continue;
+            }
+            % endfor
+            throw Pothos::InvalidArgumentException("configure("+pair.first+")", "unknown setter");
+        }
+        _staged.insert(_staged.end(), staged.begin(), staged.end());
+        if (!this->isActive()) this->applyStaged();
+    }
+
+    void applyStaged(void)
+    {
+        //the configuration staged before a direct call or a work() applies first,
+        //so the calls take effect in the order they were made
+        std::vector<std::function<void(void)>> staged;
+        staged.swap(_staged);
+        for (const auto &apply : staged) apply();
+    }
+
+    % endif
+    % for function in getters:
+    ${function.returns} ${function.key}(const size_t channel)
+    {
+        % if setters:
+        this->applyStaged();
+        % endif
+        return ${function.name}(_q.at(channel));
+    }
+    % endfor
+
+    void activate(void)
+    {
+        % for activator in activators:
+        for (auto q : _q) ${activator}(q);
+        % endfor
+        % if fastconv is not None:
+        % for activator in fastconv.activators:
+        for (auto fast : _fast) if (fast != nullptr) Traits::${fastconv.key}_${activator}(fast);
+        % endfor
+        % if len(fastconv.activators) != len(activators):
+        this->updateFastConv();
+        % endif
+        % endif
+    }
+
+    void work(void)
+    {
+        % if setters:
+        //apply the configuration staged since the last work()
+        this->applyStaged();
+
+        % endif
+        //calculate available input, the channels advance together
+        const unsigned int numAvailableIn = this->workInfo().minAllInElements;
+        const unsigned int numAvailableOut = this->workInfo().minAllOutElements;
+        unsigned int N = std::min(numAvailableIn/${worker.decim}, numAvailableOut/${worker.interp});
+        % if fastconv is not None:
+        if (_fast.front() != nullptr) N = (N/_fastLen)*_fastLen;
+        % endif
+        if (N == 0) return;
+
+        //perform work on the buffers of every channel
+        for (size_t ch = 0; ch < _q.size(); ch++)
+        {
+            % for port in inputs + outputs:
+            ${port.type} *${port.buffVar} = ${port.portVar}[ch]->buffer();
+            % endfor
+            % if fastconv is not None:
+            if (_fast[ch] != nullptr)
+            {
+                //the fast convolution object runs on whole blocks
+                for (unsigned int i = 0; i < N; i += _fastLen)
+                {
+                    Traits::${fastconv.key}_execute(_fast[ch], ${inputs[0].buffVar}+i, ${outputs[0].buffVar}+i);
+                }
+                continue;
+            }
+            % endif
+            % for function in worker.functions:
+            ${function.name}(_q[ch], ${function.args});
+            % endfor
+        }
+
+        //produce and consume resources
+        for (size_t ch = 0; ch < _q.size(); ch++)
+        {
+            % for port in inputs:
+            ${port.portVar}[ch]->consume(N*${worker.decim});
+            % endfor
+            % for port in outputs:
+            ${port.portVar}[ch]->produce(N*${worker.interp});
+            % endfor
+        }
+    }
+
+    void propagateLabels(const Pothos::InputPort *input)
+    {
+        //labels stay on the channel of the input port
+        for (size_t ch = 0; ch < _q.size(); ch++)
+        {
+            if (${' && '.join(['%s[ch] != input'%port.portVar for port in inputs])}) continue;
+            for (const auto &label : input->labels())
+            {
+                % for output in outputs:
+                ${output.portVar}[ch]->postLabel(label.toAdjusted(${worker.interp}, ${worker.decim}));
+                % endfor
+            }
+        }
+    }
+
+private:
+    % for member in members:
+    ${member.type} ${member.name};
+    % endfor
+    % if setters:
+    std::vector<std::function<void(void)>> _staged;
+    % endif
+    std::vector<${objectType}> _q;
+    % if fastconv is not None:
+    std::vector<${fastconv.type}> _fast;
+    unsigned int _fastLen;
+    % endif
+
+    % for input in inputs:
+    std::vector<Pothos::InputPort *> ${input.portVar};
+    % endfor
+    % for output in outputs:
+    std::vector<Pothos::OutputPort *> ${output.portVar};
+    % endfor
+};
+#endif //${blockClass.upper()}_DEFINED
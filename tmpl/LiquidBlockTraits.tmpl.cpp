@@ -0,0 +1,12 @@
+#ifndef ${traits.name.upper()}_DEFINED
+#define ${traits.name.upper()}_DEFINED
+struct ${traits.name}
+{
+    % for slot, type in traits.typedefs:
+    typedef ${type} ${slot}_type;
+    % endfor
+    % for key, name in traits.functions.items():
+    static constexpr auto ${key} = &${name};
+    % endfor
+};
+#endif //${traits.name.upper()}_DEFINED
@@ -0,0 +1,127 @@
+////////////////////////////////////////////////////////////////////////
+// This file is machine generated
+////////////////////////////////////////////////////////////////////////
+// Shared header of the generated sources:
+// the build precompiles it when the compiler supports it
+
+#pragma once
+#include <Pothos/Framework.hpp>
+#include <Pothos/Plugin.hpp>
+#include <complex> //need complex before liquid
+#include <liquid/liquid.h>
+#include "LiquidDesignCache.hpp"
+#include "LiquidPartitionedConv.hpp"
+#include <algorithm>
+#include <chrono>
+#include <cstring>
+#include <functional>
+#include <future>
+#include <iostream>
+#include <list>
+#include <map>
+#include <string>
+#include <utility>
+#include <vector>
+
+/***********************************************************************
+ * enum lookup tables: one entry per enum value, sorted by name
+ **********************************************************************/
+template <typename T>
+struct LiquidEnumEntry
+{
+    const char *name;
+    T value;
+};
+
+template <typename T, size_t N>
+static T liquidEnumFromString(const LiquidEnumEntry<T> (&entries)[N], const std::string &s, const char *enumName)
+{
+    const auto it = std::lower_bound(entries, entries+N, s,
+        [](const LiquidEnumEntry<T> &entry, const std::string &s){return std::strcmp(entry.name, s.c_str()) < 0;});
+    if (it != entries+N && s == it->name) return it->value;
+    throw Pothos::RuntimeException(std::string("convert string to ")+enumName+" unknown value: "+s);
+}
+
+template <typename T, size_t N>
+static std::string liquidEnumToString(const LiquidEnumEntry<T> (&entries)[N], const T value, const char *enumName)
+{
+    //the values are only known to the compiler, sort a copy by value on first use
+    //(for aliased values the alphabetically first name is reported)
+    static const std::vector<LiquidEnumEntry<T>> byValue = [&entries]()
+    {
+        std::vector<LiquidEnumEntry<T>> byValue(entries, entries+N);
+        std::stable_sort(byValue.begin(), byValue.end(),
+            [](const LiquidEnumEntry<T> &a, const LiquidEnumEntry<T> &b){return a.value < b.value;});
+        return byValue;
+    }();
+    const auto it = std::lower_bound(byValue.begin(), byValue.end(), value,
+        [](const LiquidEnumEntry<T> &entry, const T value){return entry.value < value;});
+    if (it != byValue.end() && it->value == value) return it->name;
+    throw Pothos::RuntimeException(std::string("convert ")+enumName+" to string unknown value: "+std::to_string(int(value)));
+}
+
+/***********************************************************************
+ * configure(): the (setter, value) pairs of a configuration batch,
+ * a list of [setter, value] pairs keeps its order,
+ * the setters of a dict apply in the order of their names
+ **********************************************************************/
+static std::vector<std::pair<std::string, Pothos::Object>> liquidConfigPairs(const Pothos::Object &config)
+{
+    std::vector<std::pair<std::string, Pothos::Object>> pairs;
+    if (config.type() != typeid(Pothos::ObjectKwargs) && config.canConvert(typeid(Pothos::ObjectVector)))
+    {
+        for (const auto &pair : config.convert<Pothos::ObjectVector>())
+        {
+            const auto entry = pair.convert<Pothos::ObjectVector>();
+            if (entry.size() != 2) throw Pothos::InvalidArgumentException("configure()",
+                "expected [setter, value] pairs, got "+std::to_string(entry.size())+" items");
+            pairs.emplace_back(entry[0].convert<std::string>(), entry[1]);
+        }
+        return pairs;
+    }
+    for (const auto &pair : config.convert<Pothos::ObjectKwargs>()) pairs.push_back(pair);
+    return pairs;
+}
+
+/***********************************************************************
+ * configure(): the arguments of one setter in a configuration batch
+ **********************************************************************/
+static Pothos::ObjectVector liquidConfigArgs(const std::string &name, const Pothos::Object &value, const size_t numArgs)
+{
+    //a setter with one argument takes the value, more arguments come as a list
+    if (numArgs == 1) return Pothos::ObjectVector(1, value);
+    const auto args = value.convert<Pothos::ObjectVector>();
+    if (args.size() == numArgs) return args;
+    throw Pothos::InvalidArgumentException("configure("+name+")",
+        "expected "+std::to_string(numArgs)+" arguments, got "+std::to_string(args.size()));
+}
+
+/***********************************************************************
+ * fast convolution: an fftfilt (block FFT) or a partitioned convolution object
+ * with the taps and the scale of a direct form filter,
+ * null when the filter is below the threshold
+ **********************************************************************/
+template <typename Taps, typename Object, typename Length, typename CopyTaps, typename GetScale, typename Create, typename SetScale>
+auto liquidFastConv(Object q, Length length, CopyTaps copyTaps, GetScale getScale, Create create, SetScale setScale,
+    const unsigned int threshold, const unsigned int partition, unsigned int &blockLen) -> decltype(create(nullptr, 0, 0))
+{
+    const unsigned int numTaps = length(q);
+    if (numTaps < threshold) return nullptr;
+
+    //without a partition size the block size is a power of two no shorter than the filter,
+    //the FFT is twice the block size
+    blockLen = partition;
+    if (blockLen == 0)
+    {
+        blockLen = 1;
+        while (blockLen < numTaps) blockLen *= 2;
+    }
+
+    std::vector<Taps> taps(numTaps);
+    copyTaps(q, taps.data());
+    Taps scale(1);
+    getScale(q, &scale);
+    auto fast = create(taps.data(), numTaps, blockLen);
+    setScale(fast, scale);
+    return fast;
+}
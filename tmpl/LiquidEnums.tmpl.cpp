@@ -1,36 +1,36 @@
-<%!
-import datetime
-%>
-
 ////////////////////////////////////////////////////////////////////////
-// This file is machine generated ${str(datetime.datetime.today())}
+// This file is machine generated
 ////////////////////////////////////////////////////////////////////////
 
-#include <Pothos/Config.hpp>
-#include <Pothos/Exception.hpp>
-#include <complex> //need complex before liquid
-#include <liquid/liquid.h>
-#include <string>
+#include "LiquidBlocks.hpp"
 
 % for enum in enums:
+static const LiquidEnumEntry<${enum['name']}> ${enum['name']}_entries[] = {
+    % for value in sorted(enum['values'], key=lambda v: v['name']):
+    {"${value['name']}", ${value['name']}},
+    % endfor
+};
+
 static ${enum['name']} string_to_${enum['name']}(const std::string &s)
 {
-    % for value in enum['values']:
-    if (s == "${value['name']}") return ${value['name']};
-    % endfor
-    throw Pothos::RuntimeException("convert string to ${enum['name']} unknown value: "+s);
+    return liquidEnumFromString(${enum['name']}_entries, s, "${enum['name']}");
 }
-% endfor
 
+static std::string ${enum['name']}_to_string(const ${enum['name']} value)
+{
+    return liquidEnumToString(${enum['name']}_entries, value, "${enum['name']}");
+}
+
+% endfor
 /***********************************************************************
- * registration
+ * registration: at load time, not on first use,
+ * block arguments are converted before any generated code runs
  **********************************************************************/
 
-#include <Pothos/Plugin.hpp>
-
 pothos_static_block(registerLiquidEnums)
 {
     % for enum in enums:
     Pothos::PluginRegistry::add("/object/convert/liquid_enums/string_to_${enum['name']}", Pothos::Callable(&string_to_${enum['name']}));
+    Pothos::PluginRegistry::add("/object/convert/liquid_enums/${enum['name']}_to_string", Pothos::Callable(&${enum['name']}_to_string));
     % endfor
 }
@@ -1,38 +1,101 @@
-<%!
-import datetime
-%>
-
 ////////////////////////////////////////////////////////////////////////
-// This file is machine generated ${str(datetime.datetime.today())}
+// This file is machine generated
 ////////////////////////////////////////////////////////////////////////
 
-#include <Pothos/Framework.hpp>
-#include <complex> //need complex before liquid
-#include <liquid/liquid.h>
-#include <iostream>
+#include "LiquidBlocks.hpp"
 
 ${blockClasses}
 
+% for reg in registrations:
+% if reg.designer is not None:
+/***********************************************************************
+ * designer: the constructor arguments and the design from them,
+ * the block copies it for a redesign on a helper thread
+ **********************************************************************/
+template <typename Traits>
+struct ${reg.designer.name}
+{
+    % for param in reg.designer.params:
+    ${param.type} ${param.name};
+    % endfor
+
+    ${objectType} operator()(void)
+    {
+        % for param in reg.designer.internals:
+        ${param.type} ${param.name} = ${param.default};
+        % endfor
+        return ${design};
+    }
+    % if reg.designer.carry is not None:
+
+    size_t carry(void) const
+    {
+        return ${reg.designer.carry};
+    }
+    % endif
+};
+
+% endif
+/***********************************************************************
+ * factory: create the liquid object for the class template
+ **********************************************************************/
+template <typename Traits>
+Pothos::Block *create_${reg.blockClass}(${reg.factoryParams})
+{
+    % if reg.designer is not None:
+    % for param in reg.designer.memberInternals:
+    ${param.type} ${param.name} = ${param.default};
+    % endfor
+    //the designer keeps the arguments for the redesign calls
+    ${reg.designer.name}<Traits> designer;
+    % for param in reg.designer.params:
+    designer.${param.name} = ${param.name};
+    % endfor
+    auto block = new ${reg.classTemplate}<Traits>(${', '.join(['designer()'] + memberArgs)});
+    block->setDesigner(designer);
+    % for function in reg.designer.redesigners:
+    block->registerRedesign("${function.key}", &${reg.designer.name}<Traits>::${function.name});
+    % endfor
+    return block;
+    % else:
+    % for param in internals:
+    ${param.type} ${param.name} = ${param.default};
+    % endfor
+    % if reg.channels:
+    if (numChannels == 0) throw Pothos::InvalidArgumentException("create_${reg.blockClass}()", "No channels");
+    std::vector<${objectType}> q;
+    for (size_t ch = 0; ch < numChannels; ch++) q.push_back(${design});
+    return new ${reg.classTemplate}<Traits>(${', '.join(['q'] + memberArgs)});
+    % else:
+    return new ${reg.classTemplate}<Traits>(${', '.join([design] + memberArgs)});
+    % endif
+    % endif
+}
+
 /***********************************************************************
  * registration
  **********************************************************************/
 
-% if subtypesArgs:
-Pothos::Block *make_${blockClass}(${factoryArgs})
+% if reg.subtypesArgs:
+Pothos::Block *make_${reg.blockClass}(${reg.factoryArgs})
 {
-    % for subtype, subfactory, args in subtypesArgs:
-    if (type == "${subtype}") return ${subfactory}::make(${args});
+    % for subtype, traits, args in reg.subtypesArgs:
+    if (type == "${subtype}") return create_${reg.blockClass}<${traits}>(${args});
     % endfor
-    throw Pothos::InvalidArgumentException("make_${blockClass}("+type+")", "Unknown type");
+    throw Pothos::InvalidArgumentException("make_${reg.blockClass}("+type+")", "Unknown type");
 }
 % endif
 
-static Pothos::BlockRegistry register${blockClass}(
-    "/liquid/${blockName}", &${factory});
+static Pothos::BlockRegistry register${reg.blockClass}(
+    "/liquid/${reg.blockName}", &${reg.factory});
 
-#include <Pothos/Plugin.hpp>
-
-pothos_static_block(register${blockClass}Docs)
+pothos_static_block(register${reg.blockClass}Docs)
 {
-    Pothos::PluginRegistry::add("/blocks/docs/liquid/${blockName}", std::string("${blockDescEscaped}"));
+    std::string desc;
+    desc.reserve(${reg.blockDescSize});
+    % for chunk in reg.blockDescChunks:
+    desc += "${chunk}";
+    % endfor
+    Pothos::PluginRegistry::add("/blocks/docs/liquid/${reg.blockName}", desc);
 }
+% endfor